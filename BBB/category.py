@@ -1,99 +1,129 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
-import pandas as pd
-import time
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.archive import get_archive, record_page
+from common.browser import create_driver, snapshot
+from common.scheduler import allowed_by_robots
+from common.sinks import open_sink
+from common.webdriver_pool import DriverPool
 
 # URL of the page
 url = "https://www.bbb.org/us/ca/cordelia/categories"
 
-# Setup Selenium WebDriver using WebDriver Manager
-options = webdriver.ChromeOptions()
-options.add_argument('--headless')  # Run browser in headless mode (optional)
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+# Number of browsers loading letter pages at the same time
+BROWSER_WORKERS = 6
+
+# Function to start a new headless Chrome for the pool (lean mode: eager page loads,
+# no images, fonts, stylesheets or analytics)
+def create_headless_driver():
+    return create_driver(headless=True, lean=True)
 
-# Open the website
-driver.get(url)
+# Function to open the categories page and return the alphabet pager links as (letter, url)
+def get_alpha_links(driver):
+    if not allowed_by_robots(url):
+        print(f"Skipping {url}, disallowed by robots.txt")
+        return []
 
-# Wait for the 'ul' element with both classes 'list-reset' and 'cluster' to be present
-try:
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, "ul.list-reset.cluster"))
-    )
-    print("Navigation ul found!")
-except Exception as e:
-    print(f"Error: Could not find the 'ul' tag with class 'list-reset cluster'. The page structure might have changed.")
-    driver.quit()
+    # Open the website
+    driver.get(url)
 
-# Get the page source after JavaScript execution
-html_content = driver.page_source
+    # Wait for the 'ul' element with both classes 'list-reset' and 'cluster' to be present
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "ul.list-reset.cluster"))
+        )
+        print("Navigation ul found!")
+    except Exception as e:
+        print(f"Error: Could not find the 'ul' tag with class 'list-reset cluster'. The page structure might have changed.")
+        return []
 
-# Parse the HTML using BeautifulSoup
-soup = BeautifulSoup(html_content, "html.parser")
+    # Parse the navigation (after JavaScript execution) using BeautifulSoup
+    soup = BeautifulSoup(snapshot(driver, "ul.list-reset.cluster") or driver.page_source, "html.parser")
 
-# Initialize list to store category name and link data
-category_data = []
+    # Find the ul tag with class 'list-reset cluster'
+    alpha_ul = soup.find('ul', class_='list-reset cluster')
 
-# Find the ul tag with class 'list-reset cluster'
-alpha_ul = soup.find('ul', class_='list-reset cluster')
+    # Check if the navigation ul is found
+    if alpha_ul is None:
+        print("Error: Could not find the 'ul' tag with class 'list-reset cluster'. The page structure might have changed.")
+        return []
 
-# Check if the navigation ul is found
-if alpha_ul is None:
-    print("Error: Could not find the 'ul' tag with class 'list-reset cluster'. The page structure might have changed.")
-else:
     # Extract alpha links (A-Z)
     alpha_links = alpha_ul.find_all('a', class_='dtm-all-categories-alpha-pager')
-
-    # Loop through each letter (A-Z) and extract the categories
-    for alpha_link in alpha_links:
-        # Get the link for the alphabet
-        alpha_url = alpha_link['href']
-
-        # Click on the link in Selenium to navigate to the corresponding page
-        driver.get(alpha_url)
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "bds-body"))
-            )
-        except Exception as e:
-            print(f"Error: Could not load categories for {alpha_link.text.strip()}.")
-            continue
-
-        # Get the page source for the selected alphabet category
+    return [(alpha_link.text.strip(), alpha_link['href']) for alpha_link in alpha_links]
+
+# Function to load the page of one letter and return its [category name, link] rows
+def scrape_letter(driver, alpha_link):
+    letter, alpha_url = alpha_link
+    if not allowed_by_robots(alpha_url):
+        print(f"Skipping {alpha_url}, disallowed by robots.txt")
+        return []
+
+    # Navigate to the page of the letter
+    driver.get(alpha_url)
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.CLASS_NAME, "bds-body"))
+        )
+    except Exception as e:
+        print(f"Error: Could not load categories for {letter}.")
+        return []
+
+    # Keep the whole rendered page when archiving (see BBB/replay.py), otherwise only the
+    # category list of the selected alphabet category (the whole page if it is missing)
+    if get_archive() is not None:
         category_html = driver.page_source
-        category_soup = BeautifulSoup(category_html, "html.parser")
-
-        # Find the second level of categories
-        category_ul = category_soup.find('ul', class_='bds-body css-f0ef99 e1kid4h70')
-
-        if category_ul:
-            # Find all category links
-            category_links = category_ul.find_all('a', class_='dtm-all-categories-category')
-
-            # Extract category name and link
-            for category_link in category_links:
-                category_name = category_link.text.strip()
-                category_href = category_link['href']
-                category_data.append([category_name, category_href])
-
-        else:
-            print(f"Warning: No categories found for {alpha_link.text.strip()}")
-
-# Close the browser
-driver.quit()
-
-# If categories were found, export them to an Excel file
-if category_data:
-    # Create a pandas DataFrame with the scraped data
-    df = pd.DataFrame(category_data, columns=['Category Name', 'Link'])
-
-    # Save the DataFrame to an Excel file
-    df.to_excel('bbb_categories.xlsx', index=False)
-
-    print("Data has been successfully scraped and saved to 'bbb_categories.xlsx'.")
-else:
-    print("No category data was found.")
+        record_page(alpha_url, category_html, content_type='text/html; charset=utf-8')
+    else:
+        category_html = snapshot(driver, "ul.bds-body.css-f0ef99.e1kid4h70") or driver.page_source
+
+    category_data = parse_categories(category_html)
+    if not category_data:
+        print(f"Warning: No categories found for {letter}")
+    return category_data
+
+# Function to get the [category name, link] rows from the HTML of a letter page
+def parse_categories(category_html):
+    category_soup = BeautifulSoup(category_html, "html.parser")
+
+    # Find the second level of categories
+    category_ul = category_soup.find('ul', class_='bds-body css-f0ef99 e1kid4h70')
+
+    if not category_ul:
+        return []
+
+    # Extract category name and link from all category links
+    category_data = []
+    for category_link in category_ul.find_all('a', class_='dtm-all-categories-category'):
+        category_name = category_link.text.strip()
+        category_href = category_link['href']
+        category_data.append([category_name, category_href])
+    return category_data
+
+# Main function: load the letter pages in a pool of browsers and merge the rows in letter order
+def main():
+    with DriverPool(create_headless_driver, size=BROWSER_WORKERS) as pool:
+        alpha_links = pool.run(lambda driver, page: get_alpha_links(driver), url)
+        letter_rows = pool.map(scrape_letter, alpha_links)
+
+    category_data = [row for rows in letter_rows for row in rows]
+
+    # If categories were found, export them to an Excel file
+    if category_data:
+        # Stream the rows into the Excel file
+        fieldnames = ['Category Name', 'Link']
+        with open_sink('bbb_categories.xlsx', fieldnames) as sink:
+            sink.write_rows(dict(zip(fieldnames, row)) for row in category_data)
+
+        print("Data has been successfully scraped and saved to 'bbb_categories.xlsx'.")
+    else:
+        print("No category data was found.")
+
+# Execute the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from urllib.parse import urlencode
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.business_index import BusinessIndex, CRAWL_WINDOW
+from common.fetcher import iter_fetch
+from common.frontier import Frontier, LEASE_SECONDS
+from common.metrics import export_if_enabled
+from common.sinks import open_sink
+from common.webdriver_pool import DriverPool
+import category
+import test as profiles
+
+# Job state and output of the all-category crawl (kept next to this script)
+OUTPUT_DIR = os.path.dirname(os.path.abspath(__file__))
+FRONTIER_PATH = os.path.join(OUTPUT_DIR, 'bbb_crawl.frontier.sqlite')
+# Businesses seen across categories and crawls (kept between crawls, unlike a finished frontier)
+INDEX_PATH = os.path.join(OUTPUT_DIR, 'bbb_crawl.businesses.sqlite')
+OUTPUT_PATH = os.path.join(OUTPUT_DIR, 'bbb_crawl.xlsx')
+
+# Stages of the crawl: the categories page feeds category search pages, search pages
+# feed profiles (and further search pages). Deeper stages go first so the frontier
+# stays small and output starts flowing early.
+STAGE_PRIORITY = {
+    'categories': 0,
+    'search': 1,
+    'profile': 2,
+}
+
+# Urls claimed from the frontier per round (keep a batch well within LEASE_SECONDS)
+BATCH_SIZE = 200
+# Seconds an idle worker waits before asking the frontier again
+IDLE_WAIT = 5
+
+FIELDNAMES = profiles.FIELDNAMES + ['Category']
+
+# Function to build the search url listing the businesses of a category
+def category_search_url(category_name, page=1):
+    query = {'find_country': 'USA', 'find_text': category_name, 'find_type': 'Category', 'page': page}
+    return f"https://www.bbb.org/search?{urlencode(query)}"
+
+# Function to load the categories page (A-Z) and queue the search page of every category
+def handle_categories(frontier, item):
+    with DriverPool(category.create_headless_driver, size=category.BROWSER_WORKERS) as pool:
+        alpha_links = pool.run(lambda driver, page: category.get_alpha_links(driver), item['url'])
+        letter_rows = pool.map(category.scrape_letter, alpha_links)
+
+    for rows in letter_rows:
+        for category_name, category_href in rows:
+            frontier.add(category_search_url(category_name), 'search', STAGE_PRIORITY['search'],
+                         parent=item['url'], data={'category': category_name, 'page': 1})
+    frontier.complete(item)
+
+# Function to record the profiles found on a search page under its category and queue
+# the ones not fetched within the crawl window, plus the search pages after it.
+# Any page that reports the page count queues every page after it (the frontier drops the
+# ones already queued); when the count is unknown the next page is queued only while pages
+# keep listing businesses the category did not list yet.
+def handle_search_result(frontier, index, item, company_urls, page_count):
+    data = item['data']
+    new_profiles = 0
+    for url in company_urls:
+        if index.add_reference(url, data['category']):
+            new_profiles += 1
+        if index.needs_fetch(url):
+            frontier.add(url, 'profile', STAGE_PRIORITY['profile'], parent=item['url'],
+                         data={'category': data['category']})
+
+    if page_count:
+        next_pages = range(data['page'] + 1, page_count + 1)
+    elif new_profiles:
+        next_pages = [data['page'] + 1]
+    else:
+        next_pages = []
+    for page in next_pages:
+        frontier.add(category_search_url(data['category'], page), 'search', STAGE_PRIORITY['search'],
+                     parent=item['url'], data={'category': data['category'], 'page': page})
+    frontier.complete(item)
+
+# Function to run func(url) for the items of one stage concurrently and yield (item, result)
+def iter_stage(items, func):
+    by_url = {item['url']: item for item in items}
+    for index, url, result in iter_fetch(list(by_url), func):
+        yield by_url[url], result
+
+# Function to fetch a search page; errors are returned so the item can be retried later
+def fetch_search(url):
+    try:
+        return profiles.get_search_page(url)
+    except Exception as e:
+        print(f"Error: Could not load search page {url}: {e}")
+        return None
+
+# Function to fetch a profile page; errors are returned as None like a failed fetch
+def fetch_profile(url):
+    try:
+        return profiles.scrape_data(url)
+    except Exception as e:
+        print(f"Error: Could not load profile {url}: {e}")
+        return None
+
+# Function to store the rows parsed from a fetched profile page
+def handle_profile(frontier, index, item, content):
+    index.record_fetch(item['url'], profiles.entry_to_rows(profiles.parse_data(content)))
+    frontier.complete(item)
+
+# Function to run the handler of one item. An error fails only that item (it is retried
+# up to the frontier's attempt limit) instead of killing the worker with its whole batch.
+def handle_item(frontier, item, handler, *args):
+    try:
+        handler(frontier, *args)
+    except Exception as e:
+        print(f"Error: Could not process {item['stage']} {item['url']}: {e.__class__.__name__}: {e}")
+        frontier.fail(item)
+
+# Function to process one batch of claimed urls.
+# Profile rows go to the business index, which adds the merged categories at export.
+def process_batch(frontier, index, batch):
+    for item in [item for item in batch if item['stage'] == 'categories']:
+        handle_item(frontier, item, handle_categories, item)
+
+    searches = [item for item in batch if item['stage'] == 'search']
+    for item, result in iter_stage(searches, fetch_search):
+        if result is None:
+            frontier.fail(item)
+            continue
+        company_urls, page_count = result
+        handle_item(frontier, item, handle_search_result, index, item, company_urls, page_count)
+
+    profile_items = [item for item in batch if item['stage'] == 'profile']
+    for item, content in iter_stage(profile_items, fetch_profile):
+        if not content:
+            frontier.fail(item)
+            continue
+        handle_item(frontier, item, handle_profile, index, item, content)
+
+# Function run by every worker: claim batches under a lease until the frontier is empty.
+# The leases of a batch are renewed while it is processed, however long that takes.
+# A worker that finds nothing to claim waits while other workers still hold leases,
+# since their urls come back if they die (or they discover new urls).
+def work(frontier_path, index_path, window, worker_id):
+    frontier = Frontier(frontier_path)
+    index = BusinessIndex(index_path, window)
+    try:
+        while True:
+            batch = frontier.lease_batch(worker_id, BATCH_SIZE, LEASE_SECONDS)
+            if batch:
+                with frontier.keep_leased(batch):
+                    process_batch(frontier, index, batch)
+                print(f"{worker_id}: {frontier.counts()}")
+            elif frontier.has_work():
+                time.sleep(IDLE_WAIT)
+            else:
+                break
+    finally:
+        frontier.close()
+        index.close()
+        # Worker processes end without running atexit hooks
+        export_if_enabled()
+
+# Main function: one resumable job from the categories page down to every profile.
+# Stopping the script keeps the frontier; the next start continues where it stopped.
+# --workers N runs N worker processes on this host; more hosts can join the same crawl
+# with --worker-only as long as they can open the same frontier file.
+# A business listed in several categories is fetched once and written once, with all of
+# its categories; profiles fetched by an earlier crawl within --window-days are not
+# fetched again (start a new crawl with a new --frontier file).
+def main():
+    parser = argparse.ArgumentParser(description='Crawl every BBB category into bbb_crawl.xlsx')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes to run on this host')
+    parser.add_argument('--frontier', default=FRONTIER_PATH, help='frontier file shared by all workers')
+    parser.add_argument('--index', default=INDEX_PATH, help='business index shared by all workers and crawls')
+    parser.add_argument('--window-days', type=float, default=CRAWL_WINDOW / 86400,
+                        help='days a fetched profile is reused before it is fetched again')
+    parser.add_argument('--worker-only', action='store_true', help='only work on the frontier, do not seed or export')
+    parser.add_argument('--reclaim', action='store_true',
+                        help='hand out urls still leased by a stopped run right away (no other worker may be running)')
+    args = parser.parse_args()
+
+    frontier = Frontier(args.frontier)
+    if args.reclaim:
+        frontier.reset_in_progress()
+    if not args.worker_only:
+        frontier.add(category.url, 'categories', STAGE_PRIORITY['categories'])
+    frontier.close()
+
+    window = args.window_days * 86400
+    worker_prefix = f"{socket.gethostname()}-{os.getpid()}"
+    if args.workers == 1:
+        work(args.frontier, args.index, window, f"{worker_prefix}-0")
+    else:
+        processes = [
+            multiprocessing.Process(target=work, args=(args.frontier, args.index, window, f"{worker_prefix}-{number}"))
+            for number in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+    if not args.worker_only:
+        # Every business listed within the window, once, with its merged categories
+        index = BusinessIndex(args.index, window)
+        with open_sink(OUTPUT_PATH, FIELDNAMES) as sink:
+            sink.write_rows(index.iter_merged(since=time.time() - window))
+        index.close()
+        print(f"Data saved to {OUTPUT_PATH}")
+
+# Execute the main function
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+from lxml import etree
+
+# One parser per process; comments are dropped so they never leak into extracted text
+HTML_PARSER = etree.HTMLParser(remove_comments=True, remove_pis=True)
+
+BUSINESS_NAME_CLASS = 'bds-h2 font-normal text-black'
+
+
+# Same result as BeautifulSoup's get_text(strip=True)
+def element_text(element):
+    return ''.join(text.strip() for text in element.itertext() if text.strip())
+
+
+# Function to parse a page into an lxml tree, decoding utf-8 ourselves so pages
+# without a charset declaration are not read as latin-1
+def parse_html(content):
+    if isinstance(content, bytes):
+        try:
+            return etree.fromstring(content.decode('utf-8'), HTML_PARSER)
+        except (UnicodeDecodeError, ValueError):
+            pass
+    return etree.fromstring(content, HTML_PARSER)
+
+
+def has_class(element, class_name):
+    return class_name in (element.get('class') or '').split()
+
+
+# Function to pull every field of a BBB profile page out of the HTML in a single pass.
+# Returns the raw values in document order; callers decide how to de-duplicate/format them:
+#   phones:        text of every <a class="dtm-phone">
+#   addresses:     (street, city_state_zip) for every <address> with exactly two <p class="bds-body">
+#   business_name: text of the first <span class="bds-h2 font-normal text-black" translate="no">
+#   links:         href of every <a class="dtm-url"> whose href contains 'http'
+def extract_profile(content):
+    result = {'phones': [], 'addresses': [], 'business_name': None, 'links': []}
+    root = parse_html(content)
+    if root is None:
+        return result
+
+    for element in root.iter('a', 'address', 'span'):
+        tag = element.tag
+        if tag == 'a':
+            if has_class(element, 'dtm-phone'):
+                result['phones'].append(element_text(element))
+            href = element.get('href')
+            if href is not None and 'http' in href and has_class(element, 'dtm-url'):
+                result['links'].append(href)
+        elif tag == 'address':
+            p_tags = [p for p in element.iter('p') if has_class(p, 'bds-body')]
+            if len(p_tags) == 2:
+                result['addresses'].append((element_text(p_tags[0]), element_text(p_tags[1])))
+        elif result['business_name'] is None and element.get('translate') == 'no':
+            if ' '.join((element.get('class') or '').split()) == BUSINESS_NAME_CLASS:
+                result['business_name'] = element_text(element)
+
+    return result
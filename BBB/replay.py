@@ -0,0 +1,69 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.archive import ARCHIVE_DIR_ENV, PageArchive, replay
+from common.sinks import open_sink
+import category
+import test as profiles
+
+# Re-run the parsers over pages archived by earlier runs, without fetching anything.
+# Pages are archived when a scraper runs with SCRAPER_ARCHIVE_DIR set, e.g.
+#   SCRAPER_ARCHIVE_DIR=.cache/archive python test.py
+#   python replay.py profiles --archive .cache/archive --output realstatedata.replay.xlsx
+# so a parser fix can be backfilled from the archive instead of a new crawl.
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'archive')
+
+
+def is_profile_url(url):
+    return '/profile/' in url
+
+
+def is_category_url(url):
+    return '/categories' in url
+
+
+# Function to parse every archived profile page into output rows (one per address)
+def replay_profiles(archive, parse_workers=0):
+    for url, data in replay(archive, profiles.parse_data, is_profile_url, parse_workers):
+        yield from profiles.entry_to_rows(data)
+
+
+# Function to parse every archived category letter page into output rows
+def replay_categories(archive, parse_workers=0):
+    for url, rows in replay(archive, category.parse_categories, is_category_url, parse_workers):
+        for category_name, category_href in rows:
+            yield {'Category Name': category_name, 'Link': category_href}
+
+
+REPLAYS = {
+    'profiles': (replay_profiles, profiles.FIELDNAMES, 'realstatedata.replay.xlsx'),
+    'categories': (replay_categories, ['Category Name', 'Link'], 'bbb_categories.replay.xlsx'),
+}
+
+
+# Main function: replay one kind of page from the archive into an output file
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse archived BBB pages offline")
+    parser.add_argument('kind', choices=sorted(REPLAYS))
+    parser.add_argument('--archive', default=os.environ.get(ARCHIVE_DIR_ENV, DEFAULT_ARCHIVE_DIR))
+    parser.add_argument('--output', help="output file, the format follows the extension")
+    parser.add_argument('--parse-workers', type=int, default=0, help="parse in this many processes")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.archive):
+        print(f"No archive at {args.archive}")
+        sys.exit(1)
+
+    replay_rows, fieldnames, default_output = REPLAYS[args.kind]
+    output = args.output or default_output
+    with PageArchive(args.archive) as archive, open_sink(output, fieldnames) as sink:
+        sink.write_rows(replay_rows(archive, args.parse_workers))
+
+    print(f"Replayed {args.kind} from {args.archive} into {output}")
+
+# Execute the main function
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,38 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
 import os
-import time
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.cache import DiskCache
+from common.checkpoint import Checkpoint
+from common.sinks import CsvSink, export_csv, open_sink
+from common.urls import dedupe_urls, url_key
+from common.fetcher import iter_fetch, MAX_WORKERS, PER_HOST_LIMIT
+from common.fingerprints import ChangeTracker
+from common.pipeline import parse_inline, run_pipeline
+from profile_parser import extract_profile
+
+# On-disk cache of fetched pages, re-runs only revalidate pages older than the cache TTL
+http_cache = DiskCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'http'))
 
 # Function to extract contact numbers, addresses, and website links from a single URL
 def scrape_data(url):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
-    # Retry mechanism
-    retries = 3
-    wait_time = 5
-    for attempt in range(retries):
-        try:
-            # Fetch the website content
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                print(f"Successfully fetched the content from {url}")
-                return response.content
-            else:
-                print(f"Error: Status code {response.status_code} for {url}, retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-        except requests.exceptions.RequestException as e:
-            print(f"Exception occurred for {url}: {e}, retrying in {wait_time} seconds...")
-            time.sleep(wait_time)
-    
+    content = http_cache.fetch(url)
+    if content is not None:
+        print(f"Successfully fetched the content from {url}")
+        return content
+
     print(f"Failed to retrieve the webpage after retries: {url}")
     return None
 
 # Function to parse and extract the data from the HTML content
 def parse_data(content):
-    soup = BeautifulSoup(content, 'html.parser')
+    profile = extract_profile(content)
 
-    # Extract phone numbers
-    phone_numbers = set()
-    phone_elements = soup.find_all('a', class_='dtm-phone')
-    for phone in phone_elements:
-        phone_numbers.add(phone.get_text(strip=True))
-    
-    # Extract addresses using tag <address> and find <p> within it
-    addresses = []
-    address_elements = soup.find_all('address')
-    for address in address_elements:
-        p_tags = address.find_all('p', class_='bds-body')
-        if len(p_tags) == 2:
-            street = p_tags[0].get_text(strip=True)
-            city_state_zip = p_tags[1].get_text(strip=True)
-            addresses.append(f"{street}, {city_state_zip}")
-
-    # Extract website links
-    links = set()
-    link_elements = soup.find_all('a', class_='dtm-url', href=True)
-    for link in link_elements:
-        href = link['href']
-        if 'http' in href:
-            links.add(href)
+    # Phone numbers and website links are de-duplicated, addresses keep every match
+    phone_numbers = set(profile['phones'])
+    addresses = [f"{street}, {city_state_zip}" for street, city_state_zip in profile['addresses']]
+    links = set(profile['links'])
 
     return {
         'Phone Numbers': list(phone_numbers),
@@ -64,38 +40,67 @@ def parse_data(content):
         'Website Links': list(links)
     }
 
-# Function to scrape multiple websites
-def scrape_multiple_websites(urls):
-    all_data = {
-        'Phone Numbers': [],
-        'Addresses': [],
-        'Website Links': []
-    }
+# Columns of the output file, one row per business
+FIELDNAMES = ['Phone Numbers', 'Addresses', 'Website Links']
+
+# Function to scrape pages and yield (index, url, data) as soon as each one is parsed.
+# Pages are fetched concurrently (max_workers in total, per_host per host); with
+# parse_workers > 0 parsing runs in a separate process pool (see common/pipeline.py).
+# With a tracker (common/fingerprints.py) pages that did not change since the last run
+# are not parsed again and added/changed businesses go to its delta output.
+def iter_scrape(urls, max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT, parse_workers=0, tracker=None):
+    lookup = tracker.lookup if tracker is not None else None
+    if parse_workers:
+        results = run_pipeline(urls, scrape_data, parse_data, max_workers, per_host, parse_workers, lookup=lookup)
+    else:
+        results = parse_inline(iter_fetch(urls, scrape_data, max_workers, per_host), parse_data, lookup)
 
-    for url in urls:
-        content = scrape_data(url)
-        if content:
-            data = parse_data(content)
-            all_data['Phone Numbers'].extend(data['Phone Numbers'])
-            all_data['Addresses'].extend(data['Addresses'])
-            all_data['Website Links'].extend(data['Website Links'])
+    for index, url, data in results:
+        if tracker is not None:
+            tracker.update(url, data)
+        yield index, url, data
+
+# Function to scrape multiple websites
+# Duplicate urls are dropped and the data of each business is returned in input order
+def scrape_multiple_websites(urls, max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT, parse_workers=0):
+    urls = dedupe_urls(urls)
+    results = [None] * len(urls)
+    for index, url, data in iter_scrape(urls, max_workers, per_host, parse_workers):
+        results[index] = data
 
+    all_data = [data for data in results if data is not None]
     return all_data
 
+# Function to scrape multiple websites and append each business to the sink as soon as
+# it is parsed. Urls already recorded in the checkpoint are skipped, so an interrupted
+# run continues where it stopped.
+def scrape_to_sink(urls, sink, checkpoint, max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT, parse_workers=0,
+                   tracker=None):
+    urls = dedupe_urls(urls)
+    if tracker is not None:
+        urls = list(tracker.watch(urls))
+    urls = [url for url in urls if not checkpoint.done(url_key(url))]
+    for index, url, data in iter_scrape(urls, max_workers, per_host, parse_workers, tracker):
+        sink.write_rows(entry_to_rows(data))
+        checkpoint.mark(url_key(url))
+
+# Function to turn the data of one business into output rows
+def entry_to_rows(entry):
+    return [{
+        'Phone Numbers': ', '.join(entry['Phone Numbers']),
+        'Addresses': '; '.join(entry['Addresses']),
+        'Website Links': ', '.join(entry['Website Links'])
+    }]
+
 # Function to save the aggregated data into an Excel file
 def save_to_excel(data, file_name='dentist-data.xlsx'):
-    # Prepare the data for the DataFrame
+    # Prepare the data for the DataFrame, one row per business
     rows = []
-    for i in range(max(len(data['Phone Numbers']), len(data['Addresses']), len(data['Website Links']))):
-        row = {
-            'Phone Numbers': data['Phone Numbers'][i] if i < len(data['Phone Numbers']) else '',
-            'Addresses': data['Addresses'][i] if i < len(data['Addresses']) else '',
-            'Website Links': data['Website Links'][i] if i < len(data['Website Links']) else ''
-        }
-        rows.append(row)
+    for entry in data:
+        rows.extend(entry_to_rows(entry))
 
     # Create a DataFrame from the data
-    df = pd.DataFrame(rows)
+    df = pd.DataFrame(rows, columns=FIELDNAMES)
     
     # Save the DataFrame to an Excel file in the same directory as the script
     output_file = os.path.join(os.path.dirname(__file__), file_name)
@@ -155,11 +160,31 @@ def main():
     
     ]
     
-    # Step 1: Scrape data from multiple websites
-    all_data = scrape_multiple_websites(urls)
+    # Step 1: Scrape data from multiple websites, streaming every business to a CSV file
+    # and recording finished urls in a checkpoint (an interrupted run resumes from it)
+    output_dir = os.path.dirname(os.path.abspath(__file__))
+    csv_path = os.path.join(output_dir, 'dentist-data.csv')
+    checkpoint = Checkpoint(os.path.join(output_dir, 'dentist-data.checkpoint'))
+
+    # Pages unchanged since the last run are not parsed again; added, changed and removed
+    # businesses are written to the delta file next to the full output
+    delta_sink = open_sink(os.path.join(output_dir, 'dentist-data.delta.jsonl'), append=bool(checkpoint.completed))
+    tracker = ChangeTracker(os.path.join(output_dir, '.cache', 'fingerprints.sqlite'), 'dentist-data', delta_sink)
+    with CsvSink(csv_path, FIELDNAMES, append=True) as sink:
+        scrape_to_sink(urls, sink, checkpoint, tracker=tracker)
+    # Every url of the list is marked seen, fetched or not, so only businesses dropped from
+    # the list are reported as removed
+    tracker.finish()
+    tracker.close()
+    delta_sink.close()
     
-    # Step 2: Save the aggregated data to Excel
-    save_to_excel(all_data)
+    # Step 2: Save the aggregated data to Excel (streamed; a .parquet, .jsonl or .csv name
+    # selects another format), then drop the files of the finished run
+    output_file = os.path.join(output_dir, 'dentist-data.xlsx')
+    export_csv(csv_path, output_file, FIELDNAMES)
+    checkpoint.clear()
+    os.remove(csv_path)
+    print(f"Data has been saved to {output_file}")
 
 # Execute the main function
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+import json
+import re
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+from common.retry import fetch_with_retry
+from profile_parser import has_class, parse_html
+
+# Class of the business name links on the search results page
+RESULT_LINK_CLASS = 'text-blue-medium'
+
+# Profile urls/paths inside the JSON state embedded in the page
+PROFILE_URL_PATTERN = re.compile(r'^(?:https?://(?:www\.)?bbb\.org)?/us/[^"\s]*/profile/[^"\s]+$')
+
+
+# Function to collect every string value of a JSON document that looks like a profile url
+def find_profile_urls(value, found):
+    if isinstance(value, dict):
+        for item in value.values():
+            find_profile_urls(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            find_profile_urls(item, found)
+    elif isinstance(value, str) and PROFILE_URL_PATTERN.match(value):
+        found.append(value)
+    return found
+
+
+# Function to read the profile links out of the JSON the search page is rendered from
+def links_from_embedded_json(root):
+    found = []
+    for script in root.iter('script'):
+        text = (script.text or '').strip()
+        if not text:
+            continue
+        if script.get('type') == 'application/json' or script.get('id') == '__NEXT_DATA__':
+            try:
+                find_profile_urls(json.loads(text), found)
+            except ValueError:
+                pass
+            continue
+        # Inline state such as window.__PRELOADED_STATE__ = {...};
+        match = re.search(r'=\s*(\{.*\})\s*;?\s*$', text, re.S)
+        if match:
+            try:
+                find_profile_urls(json.loads(match.group(1)), found)
+            except ValueError:
+                pass
+    return found
+
+
+# Function to get the company profile links from a parsed search results page.
+# Uses the result anchors when the server rendered them, otherwise the embedded JSON.
+def company_links_from_tree(root, page_url):
+    links = [
+        anchor.get('href') for anchor in root.iter('a')
+        if anchor.get('href') and has_class(anchor, RESULT_LINK_CLASS)
+    ]
+    if not links:
+        links = links_from_embedded_json(root)
+
+    company_urls = []
+    for link in links:
+        url = urljoin(page_url, link)
+        if url not in company_urls:
+            company_urls.append(url)
+    return company_urls
+
+
+# Function to find the number of result pages from the pager links (or the embedded
+# "totalPages" value); returns None when the page does not say
+def page_count_from_tree(root):
+    pages = []
+    for anchor in root.iter('a'):
+        href = anchor.get('href')
+        if href and 'page=' in href:
+            for value in parse_qs(urlsplit(href).query).get('page', []):
+                if value.isdigit():
+                    pages.append(int(value))
+    for script in root.iter('script'):
+        for value in re.findall(r'"totalPages"\s*:\s*(\d+)', script.text or ''):
+            pages.append(int(value))
+    return max(pages) if pages else None
+
+
+# Function to get the company profile links from the HTML of a search results page
+def extract_company_links(content, page_url):
+    root = parse_html(content)
+    if root is None:
+        return []
+    return company_links_from_tree(root, page_url)
+
+
+# Function to fetch a search results page over plain HTTP.
+# Returns (company_urls, page_count); company_urls is empty when the page could not be
+# fetched or carries no results in its static HTML, page_count is None when unknown.
+def fetch_search_page(page_url):
+    response = fetch_with_retry(page_url)
+    if response is None:
+        return [], None
+    root = parse_html(response.content)
+    if root is None:
+        return [], None
+    return company_links_from_tree(root, page_url), page_count_from_tree(root)
+
+
+# Function to fetch a search results page over plain HTTP and return its profile links
+def get_company_links_static(page_url):
+    company_urls, page_count = fetch_search_page(page_url)
+    return company_urls
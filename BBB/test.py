@@ -1,58 +1,79 @@
-from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
-import requests
 import pandas as pd
-import time
 import re
+import os
+import sys
+import threading
 
-# Set up Selenium for headless browsing
-options = Options()
-options.headless = True
-
-# Use ChromeDriverManager to manage the ChromeDriver installation
-service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service, options=options)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.browser import get_browser
+from common.cache import DiskCache
+from common.checkpoint import Checkpoint
+from common.sinks import CsvSink, export_csv, open_sink
+from common.urls import dedupe_urls, set_query_param, url_key
+from common.fetcher import iter_fetch, prefetch, MAX_WORKERS, PER_HOST_LIMIT
+from common.fingerprints import ChangeTracker
+from common.metrics import metrics
+from common.pipeline import parse_inline, run_pipeline
+from common.scheduler import allowed_by_robots
+from profile_parser import extract_profile
+from search_pages import fetch_search_page
 
 # Function to scrape data from a single page and return the company profile links
 def get_company_links(page_url):
-    driver.get(page_url)
-    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'a.text-blue-medium')))
+    company_urls, page_count = get_search_page(page_url)
+    return company_urls
+
+# Function to get the company profile links and the number of result pages of a search page.
+# The page is fetched over plain HTTP first; Chrome is only used when the static
+# response does not contain any results (the page count is then unknown).
+def get_search_page(page_url):
+    company_urls, page_count = fetch_search_page(page_url)
+    if company_urls:
+        return company_urls, page_count
 
-    # Extract all company profile links
-    links = driver.find_elements(By.CSS_SELECTOR, 'a.text-blue-medium')
-    company_urls = [link.get_attribute('href') for link in links]
+    if not allowed_by_robots(page_url):
+        return [], None
+    print(f"No results in the static page, falling back to the browser: {page_url}")
+    return get_company_links_browser(page_url), None
+
+# The shared browser renders one page at a time
+browser_lock = threading.Lock()
+
+# Function to render a search results page in Chrome and return the company profile links
+# (an empty list when none show up in time)
+# The headless browser is only started the first time it is needed and then reused;
+# it runs in lean mode since only the result links are read
+def get_company_links_browser(page_url):
+    with browser_lock, metrics.stage('render'):
+        driver = get_browser(headless=True, lean=True)
+        driver.get(page_url)
+        try:
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'a.text-blue-medium')))
+        except TimeoutException:
+            # No results on the rendered page either (e.g. past the last page): the listing stops here
+            print(f"No company links found on {page_url}")
+            return []
+
+        # Extract all company profile links
+        links = driver.find_elements(By.CSS_SELECTOR, 'a.text-blue-medium')
+        company_urls = [link.get_attribute('href') for link in links]
 
     return company_urls
 
+# On-disk cache of fetched pages, re-runs only revalidate pages older than the cache TTL
+http_cache = DiskCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'http'))
+
 # Function to extract contact numbers, addresses, and websites from a company profile URL
 def scrape_data(url):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
-    # Retry mechanism
-    retries = 3
-    wait_time = 5
-    for attempt in range(retries):
-        try:
-            response = requests.get(url, headers=headers, timeout=1000)
-            if response.status_code == 200:
-                print(f"Successfully fetched content from {url}")
-               
-                return response.content
-            else:
-                print(f"Error: Status code {response.status_code} for {url}, retrying...")
-                time.sleep(wait_time)
-        except requests.exceptions.RequestException as e:
-            print(f"Exception for {url}: {e}, retrying...")
-            time.sleep(wait_time)
-    
+    content = http_cache.fetch(url)
+    if content is not None:
+        print(f"Successfully fetched content from {url}")
+        return content
+
     print(f"Failed to retrieve the webpage after retries: {url}")
     return None
 
@@ -68,114 +89,185 @@ def parse_address_components(address_text):
 
 # Parse data from a company profile page
 def parse_data(content):
-    soup = BeautifulSoup(content, 'html.parser')
+    profile = extract_profile(content)
+
+    phone_numbers = set(profile['phones'])
+    addresses = [
+        parse_address_components(f"{street}, {city_state_zip}")
+        for street, city_state_zip in profile['addresses']
+    ]
+    links = set(profile['links'])
 
-    # Extract phone numbers
-    phone_numbers = set()
-    phone_elements = soup.find_all('a', class_='dtm-phone')
-    for phone in phone_elements:
-        phone_numbers.add(phone.get_text(strip=True))
-    
-    # Extract addresses using <address> tag and handle the <p> structure inside it
-    addresses = []
-    address_elements = soup.find_all('address')
-    for address in address_elements:
-        p_tags = address.find_all('p', class_='bds-body')
-        if len(p_tags) == 2:
-            street = p_tags[0].get_text(strip=True)
-            city_state_zip = p_tags[1].get_text(strip=True)
-            structured_address = parse_address_components(f"{street}, {city_state_zip}")
-            addresses.append(structured_address)
-
-    # Extract business name
-    business_name = None
-    business_name_element = soup.find('span', class_='bds-h2 font-normal text-black', translate='no')
-    if business_name_element:
-        business_name = business_name_element.get_text(strip=True)
-
-    # Extract website links
-    links = set()
-    link_elements = soup.find_all('a', class_='dtm-url', href=True)
-    for link in link_elements:
-        href = link['href']
-        if 'http' in href:
-            links.add(href)
-    
     return {
         'Phone Numbers': list(phone_numbers),
         'Addresses': addresses,
         'Website Links': list(links),
-        'Business Name': business_name  # Correctly capturing the business name
+        'Business Name': profile['business_name']  # Correctly capturing the business name
     }
 
 
 
+# Columns of the output file, one row per business address
+FIELDNAMES = ['Phone Numbers', 'Street', 'City', 'State', 'Zip Code', 'Website Links', 'Business Name']
+
+# Function to scrape profiles and yield (index, url, data) as soon as each one is parsed.
+# Profiles are fetched concurrently; with parse_workers > 0 parsing runs in a separate
+# process pool (see common/pipeline.py). With a tracker (common/fingerprints.py) pages
+# that did not change since the last run are not parsed again and added/changed
+# businesses go to its delta output.
+def iter_scrape(urls, max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT, parse_workers=0, tracker=None):
+    lookup = tracker.lookup if tracker is not None else None
+    if parse_workers:
+        results = run_pipeline(urls, scrape_data, parse_data, max_workers, per_host, parse_workers, lookup=lookup)
+    else:
+        results = parse_inline(iter_fetch(urls, scrape_data, max_workers, per_host), parse_data, lookup)
+
+    for index, url, data in results:
+        if tracker is not None:
+            tracker.update(url, data)
+        yield index, url, data
+
 # Function to scrape multiple websites
-def scrape_multiple_websites(urls):
-    all_data = []
-
-    for url in urls:
-        content = scrape_data(url)
-        if content:
-            data = parse_data(content)
-            all_data.append(data)
-    
+# Duplicate profiles are dropped, the rest are returned in input order
+def scrape_multiple_websites(urls, max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT, parse_workers=0):
+    urls = dedupe_urls(urls)
+    results = [None] * len(urls)
+    for index, url, data in iter_scrape(urls, max_workers, per_host, parse_workers):
+        results[index] = data
+
+    all_data = [data for data in results if data is not None]
     return all_data
 
+# Function to turn the data of one business into output rows (one per address)
+def entry_to_rows(entry):
+    phone_numbers = ', '.join(entry['Phone Numbers'])
+    websites = ', '.join(entry['Website Links'])
+
+    rows = []
+    for addr in entry['Addresses']:
+        rows.append({
+            'Phone Numbers': phone_numbers,
+            'Street': addr['street'],
+            'City': addr['city'],
+            'State': addr['state'],
+            'Zip Code': addr['zip'],
+            'Website Links': websites,
+            'Business Name': entry['Business Name']
+        })
+    return rows
+
 # Function to save scraped data into an Excel file
 def save_to_excel(data):
     rows = []
     
     for entry in data:
-        phone_numbers = ', '.join(entry['Phone Numbers'])
-        websites = ', '.join(entry['Website Links'])
-
-        for addr in entry['Addresses']:
-            rows.append({
-                'Phone Numbers': phone_numbers,
-                'Street': addr['street'],
-                'City': addr['city'],
-                'State': addr['state'],
-                'Zip Code': addr['zip'],
-                'Website Links': websites,
-                'Business Name': entry['Business Name']
-            })
+        rows.extend(entry_to_rows(entry))
     
     df = pd.DataFrame(rows)
     output_path = 'realstatedata.xlsx'
     df.to_excel(output_path, index=False)
     print(f"Data saved to {output_path}")
 
-# here we will the all pages from pagination
-def scrape_all_pages(base_url, total_pages):
-    all_data = []
+# Number of profile urls the listing crawl may discover ahead of the profile fetchers
+LISTING_BUFFER = 500
 
-    # Loop for all pages
-    for page_num in range(1, total_pages + 1):
-        page_url = f"{base_url}&page={page_num}"
+# Function to walk the search result pages and yield the url of every new profile.
+# The number of pages is read from the pages themselves unless total_pages is given,
+# and the walk stops early at a page without any profile that was not seen before.
+# With a status dict, status['complete'] tells whether every page up to the last one was
+# read; it is False when the walk stopped early (e.g. a search page failed) or the number
+# of pages never became known.
+def iter_listing_profiles(base_url, total_pages=None, status=None):
+    seen = set()
+    last_page = total_pages
+    page_num = 1
+
+    while last_page is None or page_num <= last_page:
+        page_url = set_query_param(base_url, 'page', page_num)
         print(f"Scraping page: {page_num} - URL: {page_url}")
 
         # Scrape the company profile links from the current page
-        company_urls = get_company_links(page_url)
-        
-        # Scrape the data from each company profile page
-        page_data = scrape_multiple_websites(company_urls)
-        all_data.extend(page_data)
+        company_urls, page_count = get_search_page(page_url)
+        if total_pages is None and page_count:
+            last_page = max(last_page or 0, page_count)
+
+        new_urls = []
+        for url in company_urls:
+            key = url_key(url)
+            if key not in seen:
+                seen.add(key)
+                new_urls.append(url)
+        if not new_urls:
+            print(f"No new profiles on page {page_num}, stopping")
+            break
 
+        yield from new_urls
+        page_num += 1
+
+    if status is not None:
+        status['complete'] = last_page is not None and page_num > last_page
+
+# here we will the all pages from pagination
+# Listing pages are crawled in a background thread while the profiles found on earlier
+# pages are being fetched, so the network never waits for the next search page.
+# Without a sink the data is collected and returned in discovery order. With a sink every
+# business is written as soon as it is parsed and its url is recorded in the checkpoint;
+# profiles already in the checkpoint are not fetched again, so an interrupted run resumes.
+# With a status dict the listing walk reports whether it read every page (see above).
+def scrape_all_pages(base_url, total_pages=None, sink=None, checkpoint=None, parse_workers=0, tracker=None,
+                     status=None):
+    profile_urls = prefetch(iter_listing_profiles(base_url, total_pages, status), LISTING_BUFFER)
+    if tracker is not None:
+        profile_urls = tracker.watch(profile_urls)
+    if checkpoint is not None:
+        profile_urls = (url for url in profile_urls if not checkpoint.done(url_key(url)))
+
+    # Scrape the data from each company profile page
+    results = {}
+    for index, url, data in iter_scrape(profile_urls, parse_workers=parse_workers, tracker=tracker):
+        if sink is None:
+            results[index] = data
+            continue
+        sink.write_rows(entry_to_rows(data))
+        if checkpoint is not None:
+            checkpoint.mark(url_key(url))
+
+    all_data = [results[index] for index in sorted(results)]
     return all_data
 
 # Main function to scrape data and save to Excel
 def main():
     base_url = 'https://www.bbb.org/search?find_country=USA&find_entity=50544-000&find_text=Restaurants&find_type=Category&page=1&touched=1'
-    total_pages = 1  # All pages
+    total_pages = None  # All pages, the count is read from the search page
     
-    # Step 1: Scrape all pages
-    all_data = scrape_all_pages(base_url, total_pages)
+    # Step 1: Scrape all pages, streaming every business to a CSV file and recording
+    # finished profiles in a checkpoint (an interrupted run resumes from it)
+    csv_path = 'realstatedata.csv'
+    checkpoint = Checkpoint('realstatedata.checkpoint')
+
+    # Pages unchanged since the last run are not parsed again; added, changed and removed
+    # businesses are written to the delta file next to the full output
+    delta_sink = open_sink('realstatedata.delta.jsonl', append=bool(checkpoint.completed))
+    tracker = ChangeTracker(os.path.join('.cache', 'fingerprints.sqlite'), 'realstatedata', delta_sink)
+    listing = {}
+    with CsvSink(csv_path, FIELDNAMES, append=True) as sink:
+        scrape_all_pages(base_url, total_pages, sink, checkpoint, tracker=tracker, status=listing)
+    # A business missing from an incomplete listing may just be on a page that was not read
+    if listing.get('complete'):
+        tracker.finish()
+    else:
+        print("The listing did not finish, skipping the detection of removed businesses")
+    tracker.close()
+    delta_sink.close()
     
-    # Step 2: Save the aggregated data to Excel
-    save_to_excel(all_data)
+    # Step 2: Save the aggregated data to Excel (streamed; a .parquet, .jsonl or .csv name
+    # selects another format), then drop the files of the finished run
+    output_path = 'realstatedata.xlsx'
+    export_csv(csv_path, output_path, FIELDNAMES)
+    checkpoint.clear()
+    os.remove(csv_path)
+    print(f"Data saved to {output_path}")
 
 # Execute the main function
 if __name__ == "__main__":
     main()
-    driver.quit()  
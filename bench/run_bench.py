@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(ROOT)
+# Script directories go first so BBB/test.py is found before the standard library's test package
+for script_dir in ('BBB', 'sec.gov', 'trademark'):
+    sys.path.insert(0, os.path.join(ROOT, script_dir))
+
+from common.fetcher import iter_fetch, MAX_WORKERS, PER_HOST_LIMIT
+from common.pipeline import parse_inline, run_pipeline
+from common.ratelimit import HostRateLimiter
+from common.retry import RetryPolicy, fetch_with_retry
+from common.tables import extract_records
+from profile_parser import extract_profile
+from search_pages import extract_company_links, page_count_from_tree, parse_html
+from table_specs import CONTACT_SEC, DIVISIONS_OFFICES, REGIONAL_OFFICES
+from trademark import iter_entries
+import test as profiles
+from standin_server import StandInServer, load_fixture
+
+# Offline benchmarks of the parsers and of the fetch -> parse path, run against the
+# fixtures in bench/fixtures and the local stand-in server (no network needed).
+# Usage: python bench/run_bench.py [--iterations N] [--pages N] [--latency S] ...
+#        python bench/run_bench.py --json bench.json --baseline old.json  (fails on a regression)
+
+SEC_FIXTURES = [
+    (CONTACT_SEC, 'sec_contact.html'),
+    (DIVISIONS_OFFICES, 'sec_divisions.html'),
+    (REGIONAL_OFFICES, 'sec_regional.html'),
+]
+
+
+# Value at fraction q (0..1) of the sorted samples
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# CPU seconds used by this process and its finished children (parser processes)
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+# Peak resident set size of this process so far, in MB (ru_maxrss is KB on Linux, bytes on macOS)
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Function to run func(item) for every item and time each call; returns the result row
+def measure(name, items, func):
+    latencies = []
+    cpu_before = cpu_seconds()
+    started = time.perf_counter()
+    for item in items:
+        call_started = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - call_started)
+    return result_row(name, len(latencies), time.perf_counter() - started, cpu_seconds() - cpu_before, latencies)
+
+
+def result_row(name, pages, wall, cpu, latencies):
+    return {
+        'name': name,
+        'pages': pages,
+        'pages_per_sec': pages / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'cpu_ms_per_page': cpu / pages * 1000 if pages else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def bench_parsers(iterations):
+    profile = load_fixture('bbb_profile.html')
+    search = load_fixture('bbb_search.html')
+    addresses = [f"{street}, {city_state_zip}" for street, city_state_zip in extract_profile(profile)['addresses']]
+    uspto = load_fixture('uspto_filing_abroad.html')
+
+    def parse_search(content):
+        extract_company_links(content, 'https://www.bbb.org/search')
+        page_count_from_tree(parse_html(content))
+
+    def parse_uspto(content):
+        list(iter_entries(BeautifulSoup(content, 'html.parser').find('table')))
+
+    rows = [
+        measure('bbb parse_data', [profile] * iterations, profiles.parse_data),
+        measure('bbb parse_address_components', addresses * iterations, profiles.parse_address_components),
+        measure('bbb search page', [search] * iterations, parse_search),
+    ]
+    for spec, fixture in SEC_FIXTURES:
+        content = load_fixture(fixture)
+        rows.append(measure(f"sec {spec['name']} table", [spec] * iterations,
+                            lambda spec: extract_records(BeautifulSoup(content, 'html.parser'), spec)))
+    rows.append(measure('uspto table', [uspto] * iterations, parse_uspto))
+    return rows
+
+
+# Function to fetch and parse profile pages from the stand-in server the way BBB/test.py
+# does (thread pool + per-host limit, inline or process-pool parsing)
+def bench_fetch(server, pages, workers, per_host, parse_workers, rate):
+    limiter = HostRateLimiter(rate=rate, burst=max(1, int(rate)))
+    policy = RetryPolicy(retries=5, backoff_base=0.05, backoff_max=1.0)
+    latencies = []
+
+    def fetch(url):
+        started = time.perf_counter()
+        response = fetch_with_retry(url, policy, limiter)
+        latencies.append(time.perf_counter() - started)
+        return response.content if response is not None else None
+
+    urls = [server.url(f"/profile/business-{index}") for index in range(pages)]
+    cpu_before = cpu_seconds()
+    started = time.perf_counter()
+    if parse_workers:
+        results = run_pipeline(urls, fetch, profiles.parse_data, workers, per_host, parse_workers)
+    else:
+        results = parse_inline(iter_fetch(urls, fetch, workers, per_host), profiles.parse_data)
+    parsed = sum(1 for _ in results)
+    mode = f"{parse_workers} parser processes" if parse_workers else "inline parsing"
+    return result_row(f"fetch+parse profiles ({mode})", parsed, time.perf_counter() - started,
+                      cpu_seconds() - cpu_before, latencies)
+
+
+def format_report(rows, server_statuses):
+    header = f"{'benchmark':<44}{'pages':>7}{'pages/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'cpu ms/pg':>11}{'rss MB':>9}"
+    lines = [header, '-' * len(header)]
+    for row in rows:
+        lines.append(f"{row['name']:<44}{row['pages']:>7}{row['pages_per_sec']:>11.1f}{row['p50_ms']:>9.2f}"
+                     f"{row['p99_ms']:>9.2f}{row['cpu_ms_per_page']:>11.3f}{row['peak_rss_mb']:>9.1f}")
+    if server_statuses:
+        lines.append(f"stand-in server responses: {dict(sorted(server_statuses.items()))}")
+    return '\n'.join(lines)
+
+
+# Function to compare pages/sec with a previous --json report; returns the slower benchmarks
+def regressions(rows, baseline_path, tolerance):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {row['name']: row for row in json.load(f)['results']}
+    slower = []
+    for row in rows:
+        previous = baseline.get(row['name'])
+        if previous and row['pages_per_sec'] < previous['pages_per_sec'] * (1 - tolerance):
+            slower.append(f"{row['name']}: {row['pages_per_sec']:.1f} pages/s, was {previous['pages_per_sec']:.1f}")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline scraper benchmarks")
+    parser.add_argument('--iterations', type=int, default=200, help="parser runs per fixture")
+    parser.add_argument('--pages', type=int, default=500, help="profiles fetched from the stand-in server")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--per-host', type=int, default=PER_HOST_LIMIT)
+    parser.add_argument('--parse-workers', type=int, default=0, help="also run the process-pool pipeline")
+    parser.add_argument('--rate', type=float, default=1000.0, help="requests/second allowed to the stand-in host")
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds the server waits per response")
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--skip-fetch', action='store_true', help="only benchmark the parsers")
+    parser.add_argument('--output', help="also write the report to this file (e.g. bench_output.txt)")
+    parser.add_argument('--json', help="write the results as JSON (usable as --baseline later)")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed pages/sec drop against the baseline")
+    args = parser.parse_args()
+
+    rows = bench_parsers(args.iterations)
+    statuses = {}
+    if not args.skip_fetch:
+        with StandInServer(args.latency, args.jitter, args.error_rate, args.throttle_rate, seed=1) as server:
+            rows.append(bench_fetch(server, args.pages, args.workers, args.per_host, 0, args.rate))
+            if args.parse_workers:
+                rows.append(bench_fetch(server, args.pages, args.workers, args.per_host, args.parse_workers, args.rate))
+            statuses = server.statuses
+
+    report = format_report(rows, statuses)
+    print(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': rows}, f, indent=2)
+
+    if args.baseline:
+        slower = regressions(rows, args.baseline, args.tolerance)
+        if slower:
+            print("Regressions against the baseline:")
+            for line in slower:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
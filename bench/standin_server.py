@@ -0,0 +1,135 @@
+import argparse
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Path prefix -> fixture served for it (any profile path returns the same profile page)
+ROUTES = {
+    '/profile/': 'bbb_profile.html',
+    '/search': 'bbb_search.html',
+    '/sec/contact': 'sec_contact.html',
+    '/sec/divisions': 'sec_divisions.html',
+    '/sec/regional': 'sec_regional.html',
+    '/uspto/filing-abroad': 'uspto_filing_abroad.html',
+}
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+# Local HTTP server standing in for bbb.org, sec.gov and uspto.gov.
+# Every response is delayed by latency (+/- jitter) seconds; a share of the requests
+# (error_rate) fails with 500 and another share (throttle_rate) gets 429 with a
+# Retry-After header, so retries and the adaptive rate limiter can be exercised offline.
+class StandInServer:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, retry_after=0,
+                 host='127.0.0.1', port=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.pages = {prefix: load_fixture(name) for prefix, name in ROUTES.items()}
+        self.statuses = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path):
+        return self.base_url + path
+
+    # Decide the outcome of one request: (status, body, headers)
+    def respond(self, path):
+        with self._lock:
+            roll = self._random.random()
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        time.sleep(delay)
+
+        if roll < self.error_rate:
+            return 500, b'Internal Server Error', {}
+        if roll < self.error_rate + self.throttle_rate:
+            return 429, b'Too Many Requests', {'Retry-After': str(self.retry_after)}
+        for prefix, body in self.pages.items():
+            if path.startswith(prefix):
+                return 200, body, {'Content-Type': 'text/html; charset=utf-8'}
+        return 404, b'Not Found', {}
+
+    def _record(self, status):
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real sites
+
+            def do_GET(self):
+                status, body, headers = server.respond(urlsplit(self.path).path)
+                server._record(status)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+# Serve the fixtures until interrupted, e.g. to point a scraper at it by hand
+def main():
+    parser = argparse.ArgumentParser(description="Serve the benchmark fixtures over HTTP")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument('--retry-after', type=int, default=0)
+    args = parser.parse_args()
+
+    server = StandInServer(args.latency, args.jitter, args.error_rate, args.throttle_rate, args.retry_after,
+                           port=args.port)
+    print(f"Serving {', '.join(ROUTES)} on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
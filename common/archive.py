@@ -0,0 +1,236 @@
+import glob
+import gzip
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from common.urls import canonicalize_url
+
+# Directory fetched pages are archived to when set (see get_archive)
+ARCHIVE_DIR_ENV = 'SCRAPER_ARCHIVE_DIR'
+# A new segment is started once the current one is this large (bytes)
+SEGMENT_MAX_BYTES = 1024 ** 3
+
+# Index entry: record offset, compressed length, http status, fetch time, sha1 of the canonical url
+INDEX_ENTRY = struct.Struct('<QIId20s')
+
+
+def url_hash(url):
+    return hashlib.sha1(canonicalize_url(url).encode('utf-8')).digest()
+
+
+# One archived response
+class ArchivedPage:
+    def __init__(self, url, status, fetched_at, body, headers):
+        self.url = url
+        self.status = status
+        self.fetched_at = fetched_at
+        self.body = body
+        self.headers = headers
+
+
+def _encode_record(url, body, status, fetched_at, content_type):
+    date = datetime.fromtimestamp(fetched_at, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    header = (
+        'WARC/1.1\r\n'
+        'WARC-Type: response\r\n'
+        f'WARC-Target-URI: {url}\r\n'
+        f'WARC-Date: {date}\r\n'
+        f'X-HTTP-Status: {status}\r\n'
+        f'Content-Type: {content_type or "application/octet-stream"}\r\n'
+        f'Content-Length: {len(body)}\r\n'
+        '\r\n'
+    )
+    # Each record is its own gzip member, so a segment is also a valid concatenated .gz file
+    return gzip.compress(header.encode('utf-8') + body + b'\r\n\r\n', compresslevel=6, mtime=0)
+
+
+def _decode_record(data, fetched_at):
+    raw = gzip.decompress(data)
+    header, _, rest = raw.partition(b'\r\n\r\n')
+    headers = {}
+    for line in header.decode('utf-8').split('\r\n')[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip()] = value.strip()
+    body = rest[:int(headers.get('Content-Length', len(rest)))]
+    return ArchivedPage(headers.get('WARC-Target-URI'), int(headers.get('X-HTTP-Status', 0)), fetched_at, body, headers)
+
+
+# Append-only archive of fetched pages, in the spirit of WARC: every record is a gzip member
+# appended to a segment file (<name>.warc.gz) and gets a fixed-size entry in the segment's
+# index file (<name>.idx). Readers mmap the index and segment files to jump straight to a
+# record. Each process writes its own segments, so crawl worker processes can share one
+# archive directory without locking each other.
+class PageArchive:
+    def __init__(self, directory, segment_max_bytes=SEGMENT_MAX_BYTES):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._segment = None
+        self._index = None
+        self._maps = {}
+        self._read_lock = threading.Lock()
+        self._latest = {}   # url hash -> index entry of the newest record
+        self._indexed = {}  # index file -> number of its entries already in _latest
+
+    def _open_segment(self):
+        self.close()
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{time.monotonic_ns() % 10 ** 6:06d}"
+        self._pid = os.getpid()
+        self._segment = open(os.path.join(self.directory, name + '.warc.gz'), 'ab')
+        self._index = open(os.path.join(self.directory, name + '.idx'), 'ab')
+
+    # Store the body fetched from url
+    def append(self, url, body, status=200, content_type=None, fetched_at=None):
+        fetched_at = fetched_at or time.time()
+        record = _encode_record(url, body, status, fetched_at, content_type)
+        with self._lock:
+            # A forked worker must not append to its parent's files
+            if self._segment is None or self._pid != os.getpid() or self._segment.tell() >= self.segment_max_bytes:
+                self._open_segment()
+            offset = self._segment.tell()
+            self._segment.write(record)
+            self._segment.flush()
+            # The index entry is written after the record, so an entry always points at complete data
+            self._index.write(INDEX_ENTRY.pack(offset, len(record), status, fetched_at, url_hash(url)))
+            self._index.flush()
+
+    def _map(self, path):
+        size = os.path.getsize(path)
+        mapped = self._maps.get(path)
+        if mapped is None or len(mapped) < size:
+            # The smaller map is left to the garbage collector, a running iter_index may still read it
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            self._maps[path] = mapped
+        return mapped
+
+    # Yields (segment path, offset, length, status, fetched_at, url hash) for every record,
+    # segment by segment in the order they were written
+    def iter_index(self):
+        for index_path in sorted(glob.glob(os.path.join(self.directory, '*.idx'))):
+            segment_path = index_path[:-len('.idx')] + '.warc.gz'
+            entries = self._map(index_path)
+            for position in range(len(entries) // INDEX_ENTRY.size):  # a torn last entry is ignored
+                offset, length, status, fetched_at, key = INDEX_ENTRY.unpack_from(entries, position * INDEX_ENTRY.size)
+                yield segment_path, offset, length, status, fetched_at, key
+
+    def read(self, segment_path, offset, length, fetched_at=None):
+        segment = self._map(segment_path)
+        return _decode_record(segment[offset:offset + length], fetched_at)
+
+    # Add the index entries written since the last call to the {url hash: newest entry} map;
+    # only the new tail of each index file is read
+    def _refresh(self):
+        for index_path in sorted(glob.glob(os.path.join(self.directory, '*.idx'))):
+            count = os.path.getsize(index_path) // INDEX_ENTRY.size  # a torn last entry is ignored
+            done = self._indexed.get(index_path, 0)
+            if count <= done:
+                continue
+            segment_path = index_path[:-len('.idx')] + '.warc.gz'
+            entries = self._map(index_path)
+            for position in range(done, count):
+                offset, length, status, fetched_at, key = INDEX_ENTRY.unpack_from(entries, position * INDEX_ENTRY.size)
+                latest = self._latest.get(key)
+                if latest is None or latest[4] <= fetched_at:
+                    self._latest[key] = (segment_path, offset, length, status, fetched_at, key)
+            self._indexed[index_path] = count
+
+    # Function to get {url hash: index entry} of the newest record of every url. The map is
+    # built once and then only extended with the entries added since.
+    def latest_entries(self):
+        with self._read_lock:
+            self._refresh()
+            return dict(self._latest)
+
+    # Function to get the newest archived copy of url, or None (a dict lookup once the map is built)
+    def get(self, url):
+        with self._read_lock:
+            self._refresh()
+            entry = self._latest.get(url_hash(url))
+        if entry is None:
+            return None
+        segment_path, offset, length, status, fetched_at, key = entry
+        return self.read(segment_path, offset, length, fetched_at)
+
+    # Function to yield archived pages; with latest_only, only the newest copy of every url.
+    # match(url) filters the pages by url.
+    def iter_pages(self, latest_only=True, match=None):
+        entries = self.latest_entries().values() if latest_only else self.iter_index()
+        for segment_path, offset, length, status, fetched_at, key in entries:
+            page = self.read(segment_path, offset, length, fetched_at)
+            if match is None or match(page.url):
+                yield page
+
+    def close(self):
+        for handle in (self._segment, self._index):
+            if handle is not None:
+                handle.close()
+        self._segment = self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        for mapped in self._maps.values():
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._maps = {}
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+# Function to get the archive fetched pages are recorded to, or None when archiving is off.
+# Archiving is turned on with enable_archive() or the SCRAPER_ARCHIVE_DIR environment variable.
+def get_archive():
+    global _archive
+    if _archive is None and os.environ.get(ARCHIVE_DIR_ENV):
+        with _archive_lock:
+            if _archive is None:
+                _archive = PageArchive(os.environ[ARCHIVE_DIR_ENV])
+    return _archive
+
+
+def enable_archive(directory):
+    global _archive
+    with _archive_lock:
+        _archive = PageArchive(directory)
+    return _archive
+
+
+# Function to archive a page if archiving is on (used for fetched and browser-rendered pages)
+def record_page(url, body, status=200, content_type=None):
+    archive = get_archive()
+    if archive is not None:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        archive.append(url, body, status, content_type)
+
+
+# Function to re-run parse_func over archived pages without fetching anything.
+# Yields (url, record); with parse_workers > 0 the pages are parsed in a process pool.
+def replay(archive, parse_func, match=None, parse_workers=0):
+    pages = archive.iter_pages(match=match)
+    if not parse_workers:
+        for page in pages:
+            yield page.url, parse_func(page.body)
+        return
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+        batch = []
+        for page in pages:
+            batch.append(page)
+            if len(batch) >= parse_workers * 16:
+                yield from zip((page.url for page in batch), pool.map(parse_func, [page.body for page in batch]))
+                batch = []
+        yield from zip((page.url for page in batch), pool.map(parse_func, [page.body for page in batch]))
@@ -0,0 +1,162 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+# Where the resolved chromedriver path is remembered between runs
+DRIVER_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'scraperdotcom', 'chromedriver.json')
+# How long a resolved path is trusted before webdriver-manager is asked again (seconds)
+DRIVER_CACHE_TTL = 7 * 24 * 60 * 60
+
+_browsers = {}
+_browsers_lock = threading.Lock()
+
+
+def _read_driver_cache():
+    try:
+        with open(DRIVER_CACHE_FILE, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_driver_cache(path):
+    os.makedirs(os.path.dirname(DRIVER_CACHE_FILE), exist_ok=True)
+    with open(DRIVER_CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'path': path, 'resolved_at': time.time()}, f)
+
+
+# Function to find the chromedriver executable without a network lookup on every run.
+# Order: CHROMEDRIVER_PATH, a recently cached path, webdriver-manager (result is cached),
+# a stale cached path when offline, and finally None (Selenium Manager then finds one).
+def resolve_driver_path():
+    if os.environ.get('CHROMEDRIVER_PATH'):
+        return os.environ['CHROMEDRIVER_PATH']
+
+    cached = _read_driver_cache()
+    cached_path = cached.get('path')
+    if cached_path and os.path.exists(cached_path):
+        if time.time() - cached.get('resolved_at', 0) < DRIVER_CACHE_TTL:
+            return cached_path
+
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+        path = ChromeDriverManager().install()
+    except Exception as e:
+        if cached_path and os.path.exists(cached_path):
+            print(f"Could not check for a newer chromedriver ({e}), using {cached_path}")
+            return cached_path
+        print(f"Could not resolve chromedriver with webdriver-manager ({e}), using Selenium Manager")
+        return None
+
+    _write_driver_cache(path)
+    return path
+
+
+# URL patterns blocked for each resource type in the lean rendering mode
+BLOCKED_URL_PATTERNS = {
+    'image': ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico', '*.avif'],
+    'font': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'stylesheet': ['*.css'],
+    'media': ['*.mp4', '*.webm', '*.mp3', '*.m3u8'],
+    'analytics': [
+        '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+        '*facebook.net*', '*hotjar.com*', '*newrelic.com*', '*nr-data.net*', '*segment.io*',
+    ],
+}
+
+# Settings of the lean rendering mode:
+#   page_load_strategy: 'eager' returns from driver.get() once the DOM is ready
+#   blocked_resources:  resource types (keys of BLOCKED_URL_PATTERNS) blocked through CDP
+#   images:             False disables image loading in the renderer as well
+LEAN_SETTINGS = {
+    'page_load_strategy': 'eager',
+    'blocked_resources': ['image', 'font', 'stylesheet', 'media', 'analytics'],
+    'images': False,
+}
+
+
+# Function to get the lean settings to use: None when lean is falsy, LEAN_SETTINGS for
+# True, or LEAN_SETTINGS updated with the values of a dict
+def lean_settings(lean):
+    if not lean:
+        return None
+    settings = dict(LEAN_SETTINGS)
+    if isinstance(lean, dict):
+        settings.update(lean)
+    return settings
+
+
+# Function to start a new Chrome, optionally in the lean rendering mode (see LEAN_SETTINGS)
+def create_driver(headless=True, lean=False):
+    settings = lean_settings(lean)
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument('--headless')
+    if settings:
+        options.page_load_strategy = settings['page_load_strategy']
+        if not settings['images']:
+            options.add_argument('--blink-settings=imagesEnabled=false')
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    driver_path = resolve_driver_path()
+    service = Service(driver_path) if driver_path else Service()
+    driver = webdriver.Chrome(service=service, options=options)
+
+    if settings and settings['blocked_resources']:
+        patterns = []
+        for resource_type in settings['blocked_resources']:
+            patterns.extend(BLOCKED_URL_PATTERNS[resource_type])
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    return driver
+
+
+# Function to get the outer HTML of the first element matching a CSS selector, so only
+# the part of the page we need is sent back by the browser (None when it is missing)
+def snapshot(driver, selector):
+    return driver.execute_script(
+        'const element = document.querySelector(arguments[0]);'
+        'return element ? element.outerHTML : null;',
+        selector,
+    )
+
+
+def _is_alive(driver):
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+# Function to get the warm browser shared by every scrape job in this process.
+# It is started on first use, replaced if it died, and quit when the process exits.
+# There is one browser per (headless, lean settings) combination.
+def get_browser(headless=True, lean=False):
+    settings = lean_settings(lean)
+    key = (headless, json.dumps(settings, sort_keys=True) if settings else None)
+    with _browsers_lock:
+        driver = _browsers.get(key)
+        if driver is None or not _is_alive(driver):
+            driver = create_driver(headless, settings or False)
+            _browsers[key] = driver
+        return driver
+
+
+# Function to quit the shared browsers (also runs automatically at exit)
+def quit_browsers():
+    with _browsers_lock:
+        for driver in _browsers.values():
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        _browsers.clear()
+
+
+atexit.register(quit_browsers)
@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from common.urls import url_key
+
+# A profile fetched less than this long ago is not fetched again (seconds)
+CRAWL_WINDOW = 7 * 24 * 60 * 60
+
+
+# Persistent index of BBB businesses across categories and crawls, in a SQLite file.
+# Businesses are keyed on the BBB business id of their profile url (common/urls.py), so
+# the same business reached from different categories, search pages or url spellings is
+# one entry. The index remembers every category that listed a business (and when it last
+# did) and the rows parsed from its profile with the time they were fetched, so a profile
+# is fetched once per crawl window however many categories it appears in.
+# Like the frontier, one file can be shared by several worker processes.
+class BusinessIndex:
+    def __init__(self, path, window=CRAWL_WINDOW):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.window = window
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=60, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS businesses ('
+            ' key TEXT PRIMARY KEY, url TEXT, rows TEXT, first_seen REAL, last_fetched REAL)'
+        )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS memberships ('
+            ' key TEXT, category TEXT, first_seen REAL, last_seen REAL, PRIMARY KEY (key, category))'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS memberships_seen ON memberships (last_seen)')
+
+    # Record that category lists the business of url. Returns True when the listing is new
+    # in this crawl window (never seen, or last seen before the window started).
+    def add_reference(self, url, category):
+        key = url_key(url)
+        now = time.time()
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._db.execute(
+                    'INSERT OR IGNORE INTO businesses (key, url, first_seen) VALUES (?, ?, ?)', (key, url, now)
+                )
+                row = self._db.execute(
+                    'SELECT last_seen FROM memberships WHERE key = ? AND category = ?', (key, category)
+                ).fetchone()
+                self._db.execute(
+                    'INSERT INTO memberships (key, category, first_seen, last_seen) VALUES (?, ?, ?, ?)'
+                    ' ON CONFLICT (key, category) DO UPDATE SET last_seen = excluded.last_seen',
+                    (key, category, now, now),
+                )
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+        return row is None or row[0] < now - self.window
+
+    # Function to check whether the profile of url has to be fetched (never fetched, or the
+    # last fetch is older than the crawl window)
+    def needs_fetch(self, url):
+        with self._lock:
+            row = self._db.execute('SELECT last_fetched FROM businesses WHERE key = ?', (url_key(url),)).fetchone()
+        return row is None or row[0] is None or row[0] < time.time() - self.window
+
+    # Store the rows parsed from the profile of url
+    def record_fetch(self, url, rows):
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO businesses (key, url, rows, first_seen, last_fetched) VALUES (?, ?, ?, ?, ?)'
+                ' ON CONFLICT (key) DO UPDATE SET url = excluded.url, rows = excluded.rows,'
+                ' last_fetched = excluded.last_fetched',
+                (url_key(url), url, json.dumps(rows), time.time(), time.time()),
+            )
+
+    def categories(self, url):
+        with self._lock:
+            cursor = self._db.execute(
+                'SELECT category FROM memberships WHERE key = ? ORDER BY category', (url_key(url),)
+            )
+            return [category for (category,) in cursor]
+
+    # Function to yield the profile rows of every business listed since the given time, each
+    # row with the merged categories of its business (sorted, joined with '; ') in column.
+    # Read through a separate connection so the rows are streamed, not loaded at once.
+    def iter_merged(self, since=0, column='Category'):
+        reader = sqlite3.connect(self.path, timeout=60)
+        try:
+            cursor = reader.execute(
+                'SELECT businesses.rows, group_concat(memberships.category, char(31)) FROM businesses'
+                ' JOIN memberships ON memberships.key = businesses.key'
+                ' WHERE businesses.rows IS NOT NULL'
+                ' GROUP BY businesses.key HAVING max(memberships.last_seen) >= ?'
+                ' ORDER BY businesses.rowid',
+                (since,),
+            )
+            for encoded, categories in cursor:
+                merged = '; '.join(sorted(set(categories.split('\x1f'))))
+                for row in json.loads(encoded):
+                    yield dict(row, **{column: merged})
+        finally:
+            reader.close()
+
+    def close(self):
+        self._db.close()
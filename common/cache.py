@@ -0,0 +1,209 @@
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import weakref
+
+from common.metrics import metrics
+from common.retry import fetch_with_retry
+from common.urls import canonicalize_url
+
+# Entries younger than this are served without contacting the server (seconds)
+DEFAULT_TTL = 24 * 60 * 60
+# Total size of stored bodies before the least recently used ones are evicted (bytes)
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# Access times collected by cache hits before they are written to the index in one go
+ACCESS_FLUSH_SIZE = 256
+
+
+_caches = weakref.WeakSet()
+
+
+# A SQLite connection must not be used across fork(): forked processes (e.g. the workers
+# of BBB/crawl.py) open their own connection on first use instead
+def _reset_after_fork():
+    for cache in list(_caches):
+        cache._lock = threading.Lock()
+        cache._db = None
+        cache._total = None
+        cache._accessed = {}
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _flush_caches():
+    for cache in list(_caches):
+        cache.flush()
+
+
+atexit.register(_flush_caches)
+
+
+# Disk-backed HTTP response cache keyed by canonical url.
+# Bodies are stored as files, metadata (validators, size, access time) in a SQLite index.
+# The index is opened on first use, once per process. The total size of the bodies is kept
+# in memory (read once when the index is opened) and the access times of cache hits are
+# written in batches, so neither a hit nor a store has to scan or commit the whole index.
+class DiskCache:
+    def __init__(self, directory, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = None
+        self._total = None
+        self._accessed = {}  # key -> access time not written to the index yet
+        _caches.add(self)
+
+    # Returns the connection of this process; call with the lock held
+    def _connection(self):
+        if self._db is None:
+            self._db = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), check_same_thread=False,
+                                       timeout=60)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' key TEXT PRIMARY KEY, url TEXT, size INTEGER, etag TEXT, last_modified TEXT,'
+                ' stored_at REAL, accessed_at REAL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+            self._db.commit()
+            self._total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        return self._db
+
+    # Write the collected access times (the caller commits); call with the lock held
+    def _write_access_times(self, db):
+        if self._accessed:
+            db.executemany('UPDATE entries SET accessed_at = ? WHERE key = ?',
+                           [(accessed_at, key) for key, accessed_at in self._accessed.items()])
+            self._accessed = {}
+
+    # Write the access times of recent hits to the index (also done at exit)
+    def flush(self):
+        with self._lock:
+            if self._db is not None and self._accessed:
+                self._write_access_times(self._db)
+                self._db.commit()
+
+    def _key(self, url):
+        return hashlib.sha1(canonicalize_url(url).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    # Returns the stored entry as a dict (with its body) or None
+    def get(self, url):
+        key = self._key(url)
+        with self._lock:
+            db = self._connection()
+            row = db.execute(
+                'SELECT size, etag, last_modified, stored_at FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                with open(self._path(key), 'rb') as f:
+                    body = f.read()
+            except OSError:
+                db.execute('DELETE FROM entries WHERE key = ?', (key,))
+                db.commit()
+                self._total -= row[0]
+                return None
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._write_access_times(db)
+                db.commit()
+        size, etag, last_modified, stored_at = row
+        return {
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fresh': time.time() - stored_at < self.ttl,
+        }
+
+    def put(self, url, body, etag=None, last_modified=None):
+        key = self._key(url)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            previous = db.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            db.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, canonicalize_url(url), len(body), etag, last_modified, now, now),
+            )
+            self._accessed.pop(key, None)
+            self._write_access_times(db)
+            db.commit()
+            self._total += len(body) - (previous[0] if previous else 0)
+            if self._total > self.max_bytes:
+                self._evict(db)
+
+    # Mark an entry as fresh again after the server answered 304 Not Modified
+    def touch(self, url):
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            key = self._key(url)
+            self._accessed.pop(key, None)
+            db.execute('UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?', (now, now, key))
+            db.commit()
+
+    # Drop least recently used entries until the cache fits in max_bytes. Only runs when the
+    # running total is over the limit; the total is recounted first since other processes
+    # may have stored or evicted entries too.
+    def _evict(self, db):
+        self._write_access_times(db)
+        total = db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            self._total = total
+            db.commit()
+            return
+        for key, size in db.execute('SELECT key, size FROM entries ORDER BY accessed_at').fetchall():
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        db.commit()
+        self._total = total
+
+    # Function to get a page body through the cache.
+    # Fresh entries are returned directly; stale entries are revalidated with a
+    # conditional GET so an unchanged page costs a 304 instead of a full download.
+    def fetch(self, url, **kwargs):
+        entry = self.get(url)
+        if entry is not None and entry['fresh']:
+            metrics.inc('cache_requests_total', result='hit')
+            return entry['body']
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = fetch_with_retry(url, headers=headers, ok_statuses=(200, 304), **kwargs)
+        if response is None:
+            return None
+        if response.status_code == 304 and entry is not None:
+            metrics.inc('cache_requests_total', result='revalidated')
+            self.touch(url)
+            return entry['body']
+
+        metrics.inc('cache_requests_total', result='miss')
+        self.put(url, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return response.content
@@ -0,0 +1,40 @@
+import os
+
+
+# Durable record of completed work items (one key per line, append-only).
+# Each key is fsynced as soon as it is marked, so after a crash the next run
+# can skip everything that was already written to the output.
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.completed = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.completed = {line.strip() for line in f if line.strip()}
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def done(self, key):
+        return key in self.completed
+
+    def mark(self, key):
+        if key in self.completed:
+            return
+        self._file.write(f"{key}\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.completed.add(key)
+
+    def close(self):
+        self._file.close()
+
+    # Remove the checkpoint once the run it belongs to has finished
+    def clear(self):
+        self.close()
+        os.remove(self.path)
+        self.completed = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
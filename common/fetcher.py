@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from common.scheduler import HostQueues
+
+# Default concurrency limits (total requests in flight / requests in flight per host)
+MAX_WORKERS = 16
+PER_HOST_LIMIT = 8
+
+
+# Fetch urls concurrently and yield (index, url, result) as soon as each one finishes.
+# Urls are queued per host and handed to the threads round-robin across hosts (see
+# common/scheduler.py): a host gets at most per_host requests in flight, counted across
+# every fetch loop of the process, and hosts that are out of rate budget are skipped until
+# they are ready, so their urls never block the other hosts. Only a bounded number of urls
+# is read ahead, so huge url lists stay cheap.
+def iter_fetch(urls, fetch_func, max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT):
+    queues = HostQueues(urls, per_host)
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            while True:
+                while len(pending) < max_workers:
+                    # Wait for input only when there is nothing else to wait for
+                    item = queues.next_ready(block=not pending)
+                    if item is None:
+                        break
+                    index, url, host = item
+                    pending[executor.submit(fetch_func, url)] = (index, url, host)
+
+                if not pending:
+                    if queues.done():
+                        break
+                    time.sleep(queues.wait_time)  # every queued host is waiting for its rate budget
+                    continue
+
+                # Wake up again to submit urls that arrive or hosts that become ready meanwhile
+                timeout = None if len(pending) >= max_workers or queues.done() else queues.wait_time
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, url, host = pending.pop(future)
+                    queues.release(host)
+                    yield index, url, future.result()
+        finally:
+            # The per-host slots are shared with the rest of the process, give back the ones
+            # still held when the caller stops early or a fetch raised
+            for index, url, host in pending.values():
+                queues.release(host)
+            queues.close()
+
+
+# Fetch urls concurrently and return the results in the same order as the input
+def fetch_all(urls, fetch_func, max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT):
+    urls = list(urls)
+    results = [None] * len(urls)
+    for index, url, result in iter_fetch(urls, fetch_func, max_workers, per_host):
+        results[index] = result
+    return results
+
+
+_DONE = object()
+
+
+# Run a (slow) iterator in a background thread and yield its items, keeping at most
+# buffer_size items ready ahead of the consumer. Used to produce work (e.g. listing pages)
+# while the consumer is still busy with earlier items.
+def prefetch(iterable, buffer_size=100):
+    buffer = queue.Queue(maxsize=buffer_size)
+    errors = []
+
+    def produce():
+        try:
+            for item in iterable:
+                buffer.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            buffer.put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is _DONE:
+            break
+        yield item
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from common.urls import url_key
+
+# Parts of a page that change on every request without changing its content
+VOLATILE_PATTERNS = [
+    re.compile(rb'<script\b.*?</script\s*>', re.S | re.I),
+    re.compile(rb'<style\b.*?</style\s*>', re.S | re.I),
+    re.compile(rb'<!--.*?-->', re.S),
+    re.compile(rb'\s(?:nonce|data-reactid|data-csrf|csrf-token)="[^"]*"', re.I),
+]
+WHITESPACE = re.compile(rb'\s+')
+
+
+# Function to hash the relevant content of a page (scripts, styles, comments, nonces and
+# whitespace differences are ignored), without parsing it
+def content_fingerprint(content):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    for pattern in VOLATILE_PATTERNS:
+        content = pattern.sub(b'', content)
+    return hashlib.sha256(WHITESPACE.sub(b' ', content)).hexdigest()
+
+
+# Function to put a record in a form that compares equal regardless of list order
+# (phones and links come out of sets, so their order differs between runs)
+def canonical_record(value):
+    if isinstance(value, dict):
+        return {key: canonical_record(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return sorted((canonical_record(item) for item in value), key=lambda item: json.dumps(item, sort_keys=True))
+    return value
+
+
+# Keeps the fingerprint and parsed record of every page seen in earlier runs (SQLite).
+#   lookup(url, content): the stored record when the page did not change (skip parsing),
+#                         otherwise None
+#   update(url, record):  store the freshly parsed record, writing an 'added' or 'changed'
+#                         row to the delta sink. Pass content when the page was not given
+#                         to lookup (e.g. it was rendered by the browser fallback).
+#   watch(urls):          mark the urls that belong to this run as they are iterated
+#                         (mark_seen(url) for a single one)
+#   finish():             write a 'removed' row for every stored page of this scope that
+#                         was not part of this run and forget it
+class ChangeTracker:
+    def __init__(self, path, scope, delta_sink=None):
+        self.scope = scope
+        self.delta_sink = delta_sink
+        self.seen = set()
+        self._pending = {}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints ('
+            ' scope TEXT, key TEXT, url TEXT, hash TEXT, record TEXT, updated REAL,'
+            ' PRIMARY KEY (scope, key))'
+        )
+        self._db.commit()
+
+    def _row(self, key):
+        return self._db.execute(
+            'SELECT hash, record FROM fingerprints WHERE scope = ? AND key = ?', (self.scope, key)
+        ).fetchone()
+
+    def _delta(self, change, key, url, record):
+        if self.delta_sink is not None:
+            self.delta_sink.write_rows([{'change': change, 'key': key, 'url': url, 'record': record}])
+
+    def mark_seen(self, url):
+        with self._lock:
+            self.seen.add(url_key(url))
+
+    def watch(self, urls):
+        for url in urls:
+            self.mark_seen(url)
+            yield url
+
+    def lookup(self, url, content):
+        key = url_key(url)
+        content_hash = content_fingerprint(content)
+        with self._lock:
+            self.seen.add(key)
+            row = self._row(key)
+            if row is not None and row[0] == content_hash:
+                return json.loads(row[1])
+            self._pending[key] = content_hash
+        return None
+
+    def update(self, url, record, content=None):
+        key = url_key(url)
+        with self._lock:
+            content_hash = self._pending.pop(key, None)
+            if content_hash is None:
+                if content is None:
+                    return None  # record came from lookup, nothing changed
+                content_hash = content_fingerprint(content)
+            row = self._row(key)
+            encoded = json.dumps(record, sort_keys=True)
+            self._db.execute(
+                'INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?, ?)',
+                (self.scope, key, url, content_hash, encoded, time.time()),
+            )
+            self._db.commit()
+
+            if row is None:
+                change = 'added'
+            elif canonical_record(json.loads(row[1])) != canonical_record(record):
+                change = 'changed'
+            else:
+                change = None  # page changed, but not in the fields we extract
+            if change:
+                self._delta(change, key, url, record)
+        return change
+
+    def finish(self):
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT key, url, record FROM fingerprints WHERE scope = ?', (self.scope,)
+            ).fetchall()
+            removed = [row for row in rows if row[0] not in self.seen]
+            for key, url, record in removed:
+                self._delta('removed', key, url, json.loads(record))
+                self._db.execute('DELETE FROM fingerprints WHERE scope = ? AND key = ?', (self.scope, key))
+            self._db.commit()
+        return len(removed)
+
+    def close(self):
+        self._db.close()
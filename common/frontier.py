@@ -0,0 +1,172 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from common.urls import url_key
+
+PENDING = 'pending'
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+FAILED = 'failed'
+
+# Attempts before a url is given up on
+MAX_ATTEMPTS = 3
+# How long a worker may hold a claimed url before other workers can take it over (seconds)
+LEASE_SECONDS = 600
+
+
+# Durable crawl frontier in a SQLite file. Every url has a stage (which handler
+# processes it), a priority (higher first), a status and optional json data passed on
+# from the page that discovered it. Urls are keyed like the de-duplication stage
+# (common/urls.py), so a url discovered twice is only crawled once.
+#
+# Work is handed out under time-limited leases, so several worker processes can share
+# one frontier file: a worker claims a batch with lease_batch(), and urls whose lease
+# expired (the worker died or hung) are handed to the next worker that asks.
+# Results are not kept here; the crawl stores them in its business index
+# (common/business_index.py).
+class Frontier:
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit mode; multi-statement updates use explicit BEGIN IMMEDIATE transactions
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=60, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS frontier ('
+            ' key TEXT PRIMARY KEY, url TEXT, stage TEXT, priority INTEGER, status TEXT,'
+            ' parent TEXT, data TEXT, attempts INTEGER DEFAULT 0, updated REAL,'
+            ' lease_owner TEXT, lease_expires REAL)'
+        )
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(frontier)')]
+        for column, column_type in (('lease_owner', 'TEXT'), ('lease_expires', 'REAL')):
+            if column not in columns:
+                self._db.execute(f'ALTER TABLE frontier ADD COLUMN {column} {column_type}')
+        self._db.execute('CREATE INDEX IF NOT EXISTS frontier_next ON frontier (status, priority, updated)')
+
+    # Add a url (ignored when it is already known); returns True when it was new
+    def add(self, url, stage, priority=0, parent=None, data=None):
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT OR IGNORE INTO frontier (key, url, stage, priority, status, parent, data, updated)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url_key(url), url, stage, priority, PENDING, parent, json.dumps(data), time.time()),
+            )
+        return cursor.rowcount == 1
+
+    # Claim up to limit urls for owner, highest priority first (optionally of one stage).
+    # Pending urls and urls whose lease expired are both eligible.
+    def lease_batch(self, owner, limit=100, lease_seconds=LEASE_SECONDS, stage=None):
+        now = time.time()
+        query = (
+            'SELECT key, url, stage, priority, parent, data, attempts FROM frontier'
+            ' WHERE (status = ? OR (status = ? AND lease_expires < ?))'
+        )
+        params = [PENDING, IN_PROGRESS, now]
+        if stage is not None:
+            query += ' AND stage = ?'
+            params.append(stage)
+        query += ' ORDER BY priority DESC, updated LIMIT ?'
+        params.append(limit)
+
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._db.execute(query, params).fetchall()
+                self._db.executemany(
+                    'UPDATE frontier SET status = ?, lease_owner = ?, lease_expires = ?, updated = ? WHERE key = ?',
+                    [(IN_PROGRESS, owner, now + lease_seconds, now, row[0]) for row in rows],
+                )
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+        return [self._item(row, owner) for row in rows]
+
+    def _item(self, row, owner):
+        key, url, stage, priority, parent, data, attempts = row
+        return {
+            'key': key, 'url': url, 'stage': stage, 'priority': priority, 'owner': owner,
+            'parent': parent, 'data': json.loads(data) if data else None, 'attempts': attempts,
+        }
+
+    # Extend the leases of items that are still being worked on
+    def renew(self, items, lease_seconds=LEASE_SECONDS):
+        with self._lock:
+            self._db.executemany(
+                'UPDATE frontier SET lease_expires = ? WHERE key = ? AND lease_owner = ? AND status = ?',
+                [(time.time() + lease_seconds, item['key'], item['owner'], IN_PROGRESS) for item in items],
+            )
+
+    # Keep renewing the leases of items while the block runs, so a batch that takes longer
+    # than one lease is not handed to another worker halfway through
+    @contextmanager
+    def keep_leased(self, items, lease_seconds=LEASE_SECONDS):
+        stop = threading.Event()
+
+        def renew_until_stopped():
+            while not stop.wait(lease_seconds / 3):
+                self.renew(items, lease_seconds)
+
+        renewer = threading.Thread(target=renew_until_stopped, daemon=True)
+        renewer.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            renewer.join()
+
+    # Mark an item done. Only the worker still holding the lease can do so; returns False
+    # when the lease was lost (the item was handed to another worker meanwhile).
+    def complete(self, item):
+        with self._lock:
+            cursor = self._db.execute(
+                'UPDATE frontier SET status = ?, lease_owner = NULL, lease_expires = NULL, updated = ?'
+                ' WHERE key = ? AND status = ? AND lease_owner = ?',
+                (DONE, time.time(), item['key'], IN_PROGRESS, item['owner']),
+            )
+        return cursor.rowcount == 1
+
+    # Put a failed url back in the queue, or mark it failed after max_attempts.
+    # Like complete(), only applies while the caller still holds the lease.
+    def fail(self, item, max_attempts=MAX_ATTEMPTS):
+        with self._lock:
+            cursor = self._db.execute(
+                'UPDATE frontier SET attempts = attempts + 1, updated = ?, lease_owner = NULL,'
+                ' lease_expires = NULL, status = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END'
+                ' WHERE key = ? AND status = ? AND lease_owner = ?',
+                (time.time(), max_attempts, FAILED, PENDING, item['key'], IN_PROGRESS, item['owner']),
+            )
+        return cursor.rowcount == 1
+
+    # Put urls that were being processed when the last run stopped back in the queue
+    # (only safe when no other worker is running)
+    def reset_in_progress(self):
+        with self._lock:
+            self._db.execute(
+                'UPDATE frontier SET status = ?, lease_owner = NULL, lease_expires = NULL WHERE status = ?',
+                (PENDING, IN_PROGRESS),
+            )
+
+    # True while any url is pending or leased
+    def has_work(self):
+        with self._lock:
+            row = self._db.execute(
+                'SELECT 1 FROM frontier WHERE status IN (?, ?) LIMIT 1', (PENDING, IN_PROGRESS)
+            ).fetchone()
+        return row is not None
+
+    # Number of urls per (stage, status)
+    def counts(self):
+        with self._lock:
+            rows = self._db.execute('SELECT stage, status, COUNT(*) FROM frontier GROUP BY stage, status').fetchall()
+        return {(stage, status): count for stage, status, count in rows}
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,69 @@
+# Helpers to read BeautifulSoup tables in a single pass with rowspan/colspan resolved.
+
+
+def _span(cell, name):
+    try:
+        return max(1, int(cell.get(name, 1)))
+    except (TypeError, ValueError):
+        return 1
+
+
+# Function to walk the rows of a table once and yield each row as a list of cells
+# aligned to grid columns: a cell with colspan=n fills n columns and a cell with
+# rowspan=n is repeated in the same column of the next n-1 rows
+def iter_table_grid(table):
+    carried = {}  # column -> (cell, rows still covered)
+    for row in table.find_all('tr'):
+        if row.find_parent('table') is not table:
+            continue  # row of a nested table
+
+        cells = []
+        next_carried = {}
+        column = 0
+        own_cells = iter(row.find_all(['td', 'th'], recursive=False))
+        cell = next(own_cells, None)
+        while cell is not None or any(index >= column for index in carried):
+            if column in carried:
+                spanned, left = carried[column]
+                cells.append(spanned)
+                if left > 1:
+                    next_carried[column] = (spanned, left - 1)
+                column += 1
+                continue
+            if cell is None:
+                # Only rowspans further right are left, keep the grid aligned with None
+                cells.append(None)
+                column += 1
+                continue
+            rowspan = _span(cell, 'rowspan')
+            for _ in range(_span(cell, 'colspan')):
+                cells.append(cell)
+                if rowspan > 1:
+                    next_carried[column] = (cell, rowspan - 1)
+                column += 1
+            cell = next(own_cells, None)
+
+        carried = next_carried
+        yield cells
+
+
+# Function to read a table in one pass. Returns (headings, rows): headings holds the text of
+# every grid column of the last header row (computed once), rows is a generator of the
+# remaining rows as cell lists aligned with headings.
+def read_table(table, header_rows=1):
+    grid = iter_table_grid(table)
+    headings = []
+    for _ in range(header_rows):
+        header = next(grid, [])
+        headings = [cell.get_text(strip=True) if cell is not None else '' for cell in header]
+    return headings, grid
+
+
+# Function to yield every body row of a table as a {heading: cell text} record
+def iter_table_records(table, header_rows=1):
+    headings, rows = read_table(table, header_rows)
+    for cells in rows:
+        yield {
+            heading: cell.get_text(strip=True) if cell is not None else ''
+            for heading, cell in zip(headings, cells)
+        }
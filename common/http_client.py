@@ -0,0 +1,59 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Headers sent with every request made through the shared session
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Connection': 'keep-alive',
+}
+
+# Connection pool sizes: number of hosts kept in the pool and connections kept per host.
+# pool_maxsize should be at least the number of threads fetching from the same host.
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 32
+
+# (connect, read) timeout in seconds used when the caller does not pass one
+DEFAULT_TIMEOUT = (5, 30)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+# Function to build a new session with keep-alive connection pooling for http and https
+def create_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, headers=None):
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    if headers:
+        session.headers.update(headers)
+
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# Function to get the session shared by every scraper in this process
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+# Function to resize the pools of the shared session (call before fetching starts)
+def configure(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, headers=None):
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = create_session(pool_connections, pool_maxsize, headers)
+    return _session
+
+
+# Function to send a GET request through the shared session
+def get(url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    return get_session().get(url, timeout=timeout, **kwargs)
@@ -0,0 +1,190 @@
+import atexit
+import cProfile
+import json
+import multiprocessing
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Environment variables read at exit / at first use:
+#   SCRAPER_METRICS_DIR: write metrics.json and metrics.prom there when the process exits
+#   SCRAPER_PROFILE:     comma separated stages to run under cProfile (<stage>.prof)
+#   SCRAPER_TRACEMALLOC: comma separated stages whose allocations are traced
+METRICS_DIR_ENV = 'SCRAPER_METRICS_DIR'
+PROFILE_ENV = 'SCRAPER_PROFILE'
+TRACEMALLOC_ENV = 'SCRAPER_TRACEMALLOC'
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+
+# Process-wide registry of counters, gauges and histograms with optional labels, plus
+# the per-stage timer used across fetch, render, parse and write.
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.profile_stages = set(filter(None, os.environ.get(PROFILE_ENV, '').split(',')))
+        self.tracemalloc_stages = set(filter(None, os.environ.get(TRACEMALLOC_ENV, '').split(',')))
+        self._profiles = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge_add(self, name, delta, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    # Time a block of work of one stage: records <stage>_seconds, the in-flight gauge and,
+    # when enabled for the stage, a cProfile profile and the traced allocation size
+    @contextmanager
+    def stage(self, name, **labels):
+        profile = None
+        if name in self.profile_stages:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                profile = None  # another profiler is already active in this thread
+        traced = name in self.tracemalloc_stages
+        if traced:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            allocated_before = tracemalloc.get_traced_memory()[0]
+
+        self.gauge_add(f"{name}_in_flight", 1)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - started, **labels)
+            self.gauge_add(f"{name}_in_flight", -1)
+            if traced:
+                self.observe(f"{name}_allocated_bytes", max(0, tracemalloc.get_traced_memory()[0] - allocated_before))
+            if profile is not None:
+                profile.disable()
+                with self._lock:
+                    self._profiles.setdefault(name, []).append(profile)
+
+    def to_dict(self):
+        def named(items, convert=lambda value: value):
+            result = {}
+            for (name, labels), value in sorted(items, key=lambda item: (item[0][0], item[0][1])):
+                result.setdefault(name, []).append({'labels': dict(labels), 'value': convert(value)})
+            return result
+
+        with self._lock:
+            return {
+                'counters': named(self.counters.items()),
+                'gauges': named(self.gauges.items()),
+                'histograms': named(self.histograms.items(), lambda histogram: histogram.to_dict()),
+            }
+
+    def prometheus_text(self):
+        def labels_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}'
+
+        lines = []
+        with self._lock:
+            for metric_type, items in (('counter', self.counters), ('gauge', self.gauges)):
+                for name in sorted({name for name, labels in items}):
+                    lines.append(f"# TYPE scraper_{name} {metric_type}")
+                    for (item_name, labels), value in sorted(items.items()):
+                        if item_name == name:
+                            lines.append(f"scraper_{name}{labels_text(labels)} {value}")
+            for name in sorted({name for name, labels in self.histograms}):
+                lines.append(f"# TYPE scraper_{name} histogram")
+                for (item_name, labels), histogram in sorted(self.histograms.items()):
+                    if item_name != name:
+                        continue
+                    for bound, count in histogram.to_dict()['buckets'].items():
+                        lines.append(f"scraper_{name}_bucket{labels_text(labels, [('le', bound)])} {count}")
+                    lines.append(f"scraper_{name}_sum{labels_text(labels)} {histogram.sum}")
+                    lines.append(f"scraper_{name}_count{labels_text(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def write_prometheus(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+
+    # Write the collected profiles as <stage>.prof files (open them with pstats/snakeviz)
+    def write_profiles(self, directory):
+        with self._lock:
+            profiles = dict(self._profiles)
+        for name, stage_profiles in profiles.items():
+            pstats.Stats(*stage_profiles).dump_stats(os.path.join(directory, f"{name}.prof"))
+
+    # Worker processes (e.g. BBB/crawl.py workers) export under their own subdirectory
+    def export(self, directory):
+        if multiprocessing.parent_process() is not None:
+            directory = os.path.join(directory, f"worker-{os.getpid()}")
+        os.makedirs(directory, exist_ok=True)
+        self.write_json(os.path.join(directory, 'metrics.json'))
+        self.write_prometheus(os.path.join(directory, 'metrics.prom'))
+        self.write_profiles(directory)
+
+
+metrics = Metrics()
+
+
+# Function to write the metrics of this process when SCRAPER_METRICS_DIR is set. Runs at
+# exit; multiprocessing workers skip atexit hooks, so their target calls it when done.
+def export_if_enabled():
+    directory = os.environ.get(METRICS_DIR_ENV)
+    if directory:
+        metrics.export(directory)
+
+
+atexit.register(export_if_enabled)
@@ -0,0 +1,91 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from common.fetcher import iter_fetch, MAX_WORKERS, PER_HOST_LIMIT
+from common.metrics import metrics
+
+# Number of fetched pages allowed to wait for a parser before fetching pauses
+QUEUE_SIZE = 64
+
+_DONE = object()
+
+
+# Three-stage pipeline: fetch threads -> bounded queue -> process pool of parsers.
+# Yields (index, url, record) as records are parsed (not in input order); pages that
+# could not be fetched are skipped. parse_func must be a module-level function so it
+# can be sent to the worker processes.
+# Memory stays bounded: when the parsers fall behind the queue fills up and the
+# fetch threads block until there is room again.
+# When lookup is given, lookup(url, content) is called first and a record it returns is
+# yielded without parsing (e.g. an unchanged page, see common/fingerprints.py).
+def run_pipeline(urls, fetch_func, parse_func, fetch_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT,
+                 parse_workers=None, queue_size=QUEUE_SIZE, lookup=None):
+    parse_workers = parse_workers or os.cpu_count() or 1
+    fetched = queue.Queue(maxsize=queue_size)
+    errors = []
+
+    def produce():
+        try:
+            for index, url, content in iter_fetch(urls, fetch_func, fetch_workers, per_host):
+                if content:
+                    fetched.put((index, url, content))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            fetched.put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+        in_flight = {}
+        max_in_flight = parse_workers * 2
+        finished = False
+
+        while not finished or in_flight:
+            # Hand fetched pages to the parsers while they have room
+            while not finished and len(in_flight) < max_in_flight:
+                try:
+                    item = fetched.get(timeout=0.05 if in_flight else None)
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    finished = True
+                    break
+                index, url, content = item
+                record = lookup(url, content) if lookup else None
+                if record is not None:
+                    metrics.inc('parse_skipped_total')
+                    yield index, url, record
+                    continue
+                in_flight[pool.submit(parse_func, content)] = (index, url, time.perf_counter())
+                metrics.gauge_add('parse_in_flight', 1)
+
+            if in_flight:
+                done, _ = wait(in_flight, timeout=0.05, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, url, submitted = in_flight.pop(future)
+                    # Measured from the parent process: includes the hand-off to the worker
+                    metrics.observe('parse_seconds', time.perf_counter() - submitted)
+                    metrics.gauge_add('parse_in_flight', -1)
+                    yield index, url, future.result()
+
+    if errors:
+        raise errors[0]
+
+
+# Function to parse fetched pages in the calling thread: takes (index, url, content) items
+# as yielded by iter_fetch and yields (index, url, record), skipping failed fetches.
+# lookup works as in run_pipeline.
+def parse_inline(fetched, parse_func, lookup=None):
+    for index, url, content in fetched:
+        if content:
+            record = lookup(url, content) if lookup else None
+            if record is not None:
+                metrics.inc('parse_skipped_total')
+            else:
+                with metrics.stage('parse'):
+                    record = parse_func(content)
+            yield index, url, record
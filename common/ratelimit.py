@@ -0,0 +1,110 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Default per-host request rate (requests per second) and burst size
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+MIN_RATE = 0.2
+
+# Status codes that mean the server wants us to slow down
+THROTTLE_STATUSES = {429, 503}
+
+
+# Token bucket that lowers its rate when the server throttles us and slowly raises it
+# again while responses are healthy (additive increase, multiplicative decrease)
+class TokenBucket:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, min_rate=MIN_RATE):
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Block the calling thread until a token is available
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait_time)
+
+    # Seconds until acquire() would hand out a token (0 when one is available now)
+    def ready_in(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return max(0.0, self.paused_until - now, (1 - self.tokens) / self.rate)
+
+    # Cap the rate for good, e.g. to honour a robots.txt Crawl-delay
+    def limit(self, max_rate, burst=1):
+        with self._lock:
+            self.max_rate = min(self.max_rate, max_rate)
+            self.min_rate = min(self.min_rate, self.max_rate)
+            self.rate = min(self.rate, self.max_rate)
+            self.burst = min(self.burst, burst)
+            self.tokens = min(self.tokens, self.burst)
+
+    # Stop handing out tokens for a while (used for Retry-After)
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    # Adjust the rate from the status code of a finished request
+    def record(self, status_code):
+        with self._lock:
+            if status_code in THROTTLE_STATUSES:
+                self.rate = max(self.min_rate, self.rate / 2)
+            elif status_code is not None and status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+# Keeps one token bucket per host so throttling on one host does not slow down the others
+class HostRateLimiter:
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, min_rate=MIN_RATE):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def bucket(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst, self.min_rate)
+            return self._buckets[host]
+
+    def acquire(self, url):
+        self.bucket(url).acquire()
+
+    def ready_in(self, url):
+        return self.bucket(url).ready_in()
+
+    def limit(self, url, max_rate, burst=1):
+        self.bucket(url).limit(max_rate, burst)
+
+    def pause(self, url, seconds):
+        self.bucket(url).pause(seconds)
+
+    def record(self, url, status_code):
+        self.bucket(url).record(status_code)
+
+
+_limiter = HostRateLimiter()
+
+
+# Function to get the rate limiter shared by every scraper in this process
+def get_rate_limiter():
+    return _limiter
@@ -0,0 +1,122 @@
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from common import http_client
+from common.archive import record_page
+from common.metrics import metrics
+from common.ratelimit import THROTTLE_STATUSES, get_rate_limiter
+from common.scheduler import allowed_by_robots
+
+# Status codes worth retrying; any other error status (404, 403, ...) fails immediately
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+# Describes how often and how long to wait before retrying a failed request
+class RetryPolicy:
+    def __init__(self, retries=3, backoff_base=1.0, backoff_max=60.0, jitter=0.5,
+                 retry_statuses=RETRY_STATUSES, respect_retry_after=True, max_retry_after=300.0):
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.retry_statuses = set(retry_statuses)
+        self.respect_retry_after = respect_retry_after
+        # A Retry-After longer than this (seconds) makes us give up instead of waiting
+        self.max_retry_after = max_retry_after
+
+    def should_retry(self, status_code):
+        return status_code in self.retry_statuses
+
+    # Exponential backoff with jitter, or the server's full Retry-After when it sent one
+    def delay(self, attempt, response=None):
+        if response is not None and self.respect_retry_after:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return retry_after
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+
+# Function to turn a Retry-After header (seconds or HTTP date) into seconds
+def parse_retry_after(value):
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+# Function to GET a url with rate limiting and retries.
+# Returns the response when its status is in ok_statuses, otherwise None (also when the
+# host's robots.txt disallows the url).
+# Backoff only sleeps the calling thread, so other requests (and other hosts)
+# keep going while this one waits.
+def fetch_with_retry(url, policy=DEFAULT_POLICY, limiter=None, timeout=http_client.DEFAULT_TIMEOUT,
+                     ok_statuses=(200,), **kwargs):
+    limiter = limiter or get_rate_limiter()
+    host = urlsplit(url).hostname or ''
+    if not allowed_by_robots(url):
+        print(f"Skipping {url}, disallowed by robots.txt")
+        return None
+
+    for attempt in range(policy.retries):
+        if attempt:
+            metrics.inc('http_retries_total', host=host)
+        limiter.acquire(url)
+        try:
+            with metrics.stage('fetch', host=host):
+                response = http_client.get(url, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            metrics.inc('http_requests_total', host=host, status='error')
+            limiter.record(url, None)
+            if attempt + 1 == policy.retries:
+                print(f"Exception occurred for {url}: {e}")
+                break
+            wait_time = policy.delay(attempt)
+            print(f"Exception occurred for {url}: {e}, retrying in {wait_time:.1f} seconds...")
+            time.sleep(wait_time)
+            continue
+
+        # elapsed covers sending the request up to parsing the headers, i.e. time to first byte
+        metrics.observe('http_first_byte_seconds', response.elapsed.total_seconds(), host=host)
+        metrics.inc('http_requests_total', host=host, status=str(response.status_code))
+        metrics.inc('http_response_bytes_total', len(response.content), host=host)
+        limiter.record(url, response.status_code)
+        if response.status_code in ok_statuses:
+            if response.status_code == 200:
+                record_page(url, response.content, 200, response.headers.get('Content-Type'))
+            return response
+        if not policy.should_retry(response.status_code):
+            print(f"Error: Status code {response.status_code} for {url}, not retrying")
+            return None
+
+        wait_time = policy.delay(attempt, response)
+        if response.status_code in THROTTLE_STATUSES:
+            limiter.pause(url, wait_time)
+        if wait_time > policy.max_retry_after:
+            # Retrying before the server's Retry-After would only get us throttled harder
+            print(f"Error: Status code {response.status_code} for {url}, server asks to wait "
+                  f"{wait_time:.0f} seconds, giving up")
+            return None
+        if attempt + 1 == policy.retries:
+            print(f"Error: Status code {response.status_code} for {url}")
+            break
+        print(f"Error: Status code {response.status_code} for {url}, retrying in {wait_time:.1f} seconds...")
+        time.sleep(wait_time)
+
+    return None
@@ -0,0 +1,235 @@
+import collections
+import queue
+import threading
+import time
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+from common import http_client
+from common.metrics import metrics
+from common.ratelimit import get_rate_limiter
+
+# How long fetched robots.txt rules are trusted (seconds)
+ROBOTS_TTL = 24 * 60 * 60
+# When robots.txt could not be fetched (network error, 5xx) everything is allowed, but only
+# for this long before we ask again
+ROBOTS_RETRY_TTL = 10 * 60
+# Urls read ahead from the input so hosts further down the list can be interleaved
+LOOKAHEAD = 1000
+# Seconds to wait before checking again when every queued host is busy or rate limited
+IDLE_POLL = 0.05
+
+_END = object()
+
+
+def host_of(url):
+    return urlsplit(url).netloc.lower()
+
+
+# Caches the robots.txt rules of every host for the whole process.
+# Crawl-delay / Request-rate are applied to the shared rate limiter of the host the first
+# time its rules are loaded, so every scraper in the process slows down together.
+class RobotsCache:
+    def __init__(self, user_agent=None, ttl=ROBOTS_TTL, limiter=None):
+        self.user_agent = user_agent or http_client.DEFAULT_HEADERS['User-Agent']
+        self.ttl = ttl
+        self.limiter = limiter or get_rate_limiter()
+        self._lock = threading.Lock()
+        self._host_locks = {}
+        self._rules = {}  # origin -> (parser or None when everything is allowed, expires)
+
+    def _host_lock(self, origin):
+        with self._lock:
+            return self._host_locks.setdefault(origin, threading.Lock())
+
+    def _fetch(self, origin):
+        try:
+            response = http_client.get(origin + '/robots.txt')
+        except requests.exceptions.RequestException as e:
+            print(f"Could not fetch {origin}/robots.txt ({e}), allowing all for now")
+            return None, ROBOTS_RETRY_TTL
+        if response.status_code >= 500:
+            print(f"Error: Status code {response.status_code} for {origin}/robots.txt, allowing all for now")
+            return None, ROBOTS_RETRY_TTL
+        if response.status_code >= 400:
+            return None, self.ttl  # no robots.txt: everything is allowed
+
+        parser = RobotFileParser(origin + '/robots.txt')
+        parser.parse(response.text.splitlines())
+        return parser, self.ttl
+
+    def _apply_delay(self, origin, parser):
+        rates = []
+        delay = parser.crawl_delay(self.user_agent)
+        if delay:
+            rates.append(1 / float(delay))
+        request_rate = parser.request_rate(self.user_agent)
+        if request_rate and request_rate.requests and request_rate.seconds:
+            rates.append(request_rate.requests / request_rate.seconds)
+        if rates:
+            print(f"{origin} asks for at most {min(rates):.2f} requests/second, limiting the rate")
+            self.limiter.limit(origin + '/', min(rates))
+
+    # Function to get the robots.txt parser of the url's host (None when everything is allowed)
+    def rules(self, url):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        cached = self._rules.get(origin)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+
+        # One thread fetches robots.txt while the others of the same host wait for it
+        with self._host_lock(origin):
+            cached = self._rules.get(origin)
+            if cached is not None and cached[1] > time.monotonic():
+                return cached[0]
+            parser, ttl = self._fetch(origin)
+            if parser is not None:
+                self._apply_delay(origin, parser)
+            self._rules[origin] = (parser, time.monotonic() + ttl)
+            return parser
+
+    def allowed(self, url):
+        parser = self.rules(url)
+        if parser is None or parser.can_fetch(self.user_agent, url):
+            return True
+        metrics.inc('robots_disallowed_total', host=host_of(url))
+        return False
+
+
+# Requests in flight per host across every fetch loop of the process, so scrapers running
+# side by side share one per-host budget instead of each bringing their own
+class HostSlots:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = collections.Counter()
+
+    def try_acquire(self, host, limit):
+        with self._lock:
+            if self._in_flight[host] >= limit:
+                return False
+            self._in_flight[host] += 1
+            return True
+
+    def release(self, host):
+        with self._lock:
+            self._in_flight[host] -= 1
+            if self._in_flight[host] <= 0:
+                del self._in_flight[host]
+
+
+# One queue of urls per host, served round-robin. A host is skipped while its requests in
+# flight are at the per-host limit or its rate budget is used up, so a slow or throttled
+# host never holds up the urls of the other hosts.
+# The urls are read from the input by a background thread, and only the urls it already
+# read are queued; a slow input (e.g. a listing crawl still running) therefore never keeps
+# the urls found so far from being fetched.
+class HostQueues:
+    def __init__(self, urls, per_host, slots=None, limiter=None, lookahead=LOOKAHEAD):
+        self.per_host = per_host
+        self.slots = slots or get_host_slots()
+        self.limiter = limiter or get_rate_limiter()
+        self.lookahead = lookahead
+        self._incoming = queue.Queue(maxsize=lookahead)
+        self._closed = threading.Event()
+        self._errors = []
+        self._exhausted = False
+        self._queues = collections.OrderedDict()  # host -> deque of (index, url), in serving order
+        self._queued = 0
+        self.wait_time = 0.0
+        threading.Thread(target=self._read, args=(urls,), daemon=True).start()
+
+    def _put(self, item):
+        while not self._closed.is_set():
+            try:
+                self._incoming.put(item, timeout=IDLE_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self, urls):
+        try:
+            for item in enumerate(urls):
+                if not self._put(item):
+                    return  # the fetch loop stopped early
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            self._put(_END)
+
+    def _add(self, item):
+        if item is _END:
+            self._exhausted = True
+            if self._errors:
+                raise self._errors[0]
+            return
+        self._queues.setdefault(host_of(item[1]), collections.deque()).append(item)
+        self._queued += 1
+
+    # Queue the urls read so far; with block, wait for one when none is queued at all
+    def _fill(self, block=False):
+        if block and not self._exhausted and self._queued == 0:
+            self._add(self._incoming.get())
+        while not self._exhausted and self._queued < self.lookahead:
+            try:
+                item = self._incoming.get_nowait()
+            except queue.Empty:
+                break
+            self._add(item)
+
+    def done(self):
+        self._fill()
+        return self._exhausted and self._queued == 0
+
+    def close(self):
+        self._closed.set()
+
+    # Function to take the next url of the first host (in round-robin order) that may be
+    # fetched now. Returns (index, url, host), or None with wait_time set to the time until a
+    # rate limited host is ready again (IDLE_POLL when hosts are only waiting for slots or
+    # for more input). With block, waits for input while no url is queued.
+    def next_ready(self, block=False):
+        self._fill(block)
+        waits = []
+        for host in list(self._queues):
+            ready_in = self.limiter.ready_in(self._queues[host][0][1])
+            if ready_in > 0:
+                waits.append(ready_in)
+                continue
+            if not self.slots.try_acquire(host, self.per_host):
+                waits.append(IDLE_POLL)
+                continue
+
+            queue = self._queues.pop(host)
+            index, url = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues[host] = queue  # back of the line
+            return index, url, host
+
+        self.wait_time = min(waits) if waits else IDLE_POLL
+        return None
+
+    def release(self, host):
+        self.slots.release(host)
+
+
+_robots = RobotsCache()
+_slots = HostSlots()
+
+
+# Function to get the robots.txt cache shared by every scraper in this process
+def get_robots_cache():
+    return _robots
+
+
+def get_host_slots():
+    return _slots
+
+
+# Function to check a url against its host's robots.txt (fetched once and cached)
+def allowed_by_robots(url):
+    return _robots.allowed(url)
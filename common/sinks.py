@@ -0,0 +1,198 @@
+import csv
+import json
+import os
+
+import pandas as pd
+
+from common.metrics import metrics
+
+# Rows collected before a batch is handed to the underlying writer
+BATCH_SIZE = 1000
+
+
+# Base class of the output sinks. Rows (dicts) are passed to write_rows in any number of
+# calls; they are buffered and written in batches, so the full data set is never held
+# in memory (except by ExcelSink, which keeps the old DataFrame behaviour).
+class Sink:
+    def __init__(self, path, fieldnames=None, batch_size=BATCH_SIZE):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.batch_size = batch_size
+        self._batch = []
+        output_dir = os.path.dirname(path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+    def write_rows(self, rows):
+        for row in rows:
+            self._batch.append(row)
+            if len(self._batch) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if self._batch:
+            with metrics.stage('write', sink=type(self).__name__):
+                self.write_batch(self._batch)
+            metrics.inc('rows_written_total', len(self._batch), sink=type(self).__name__)
+            self._batch = []
+
+    def write_batch(self, rows):
+        raise NotImplementedError
+
+    # Without fieldnames the columns are the keys of the first batch, in first-seen order
+    def _columns(self, rows):
+        if self.fieldnames is None:
+            self.fieldnames = list(dict.fromkeys(name for row in rows for name in row))
+        return self.fieldnames
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# CSV rows, flushed to disk after every write_rows call so a crash loses at most the rows
+# being written. With append=True an existing file is continued (its header is not
+# written again), which is what resuming an interrupted run needs.
+class CsvSink(Sink):
+    def __init__(self, path, fieldnames, append=False, batch_size=BATCH_SIZE):
+        super().__init__(path, fieldnames, batch_size)
+        new_file = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction='ignore')
+        if new_file:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def write_rows(self, rows):
+        super().write_rows(rows)
+        self.flush()
+
+    def write_batch(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+# One JSON object per line
+class JsonlSink(Sink):
+    def __init__(self, path, fieldnames=None, append=False, batch_size=BATCH_SIZE):
+        super().__init__(path, fieldnames, batch_size)
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def write_batch(self, rows):
+        if self.fieldnames:
+            rows = [{name: row.get(name) for name in self.fieldnames} for row in rows]
+        self._file.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+        self._file.flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+# Parquet file written one row group per batch (needs pyarrow). Every column is stored
+# as a string, which is what the scrapers produce. Without fieldnames the schema is taken
+# from the first batch.
+class ParquetSink(Sink):
+    def __init__(self, path, fieldnames=None, batch_size=BATCH_SIZE):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Writing Parquet needs pyarrow: pip install pyarrow")
+        super().__init__(path, fieldnames, batch_size)
+        self._pa = pa
+        self._pq = pq
+        self._writer = None
+        if fieldnames is not None:
+            self._open_writer()
+
+    def _open_writer(self):
+        self._schema = self._pa.schema([(name, self._pa.string()) for name in self.fieldnames])
+        self._writer = self._pq.ParquetWriter(self.path, self._schema)
+
+    def write_batch(self, rows):
+        if self._writer is None:
+            self._columns(rows)
+            self._open_writer()
+        columns = {
+            name: [None if row.get(name) is None else str(row.get(name)) for row in rows]
+            for name in self.fieldnames
+        }
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self._schema))
+
+    def close(self):
+        super().close()
+        if self._writer is None:
+            self.fieldnames = []  # nothing was written: an empty file without columns
+            self._open_writer()
+        self._writer.close()
+
+
+# Excel file written with openpyxl's write-only (streaming) workbook. Without fieldnames
+# the header is taken from the first batch.
+class XlsxSink(Sink):
+    def __init__(self, path, fieldnames=None, batch_size=BATCH_SIZE):
+        from openpyxl import Workbook
+        super().__init__(path, fieldnames, batch_size)
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet()
+        if fieldnames is not None:
+            self._sheet.append(fieldnames)
+
+    def write_batch(self, rows):
+        if self.fieldnames is None:
+            self._sheet.append(self._columns(rows))
+        for row in rows:
+            self._sheet.append([row.get(name) for name in self.fieldnames])
+
+    def close(self):
+        super().close()
+        self._workbook.save(self.path)
+
+
+# Excel file written through a pandas DataFrame at close, like the scripts' save_to_excel
+class ExcelSink(Sink):
+    def __init__(self, path, fieldnames=None, batch_size=BATCH_SIZE):
+        super().__init__(path, fieldnames, batch_size)
+        self._rows = []
+
+    def write_batch(self, rows):
+        self._rows.extend(rows)
+
+    def close(self):
+        super().close()
+        pd.DataFrame(self._rows, columns=self.fieldnames).to_excel(self.path, index=False)
+
+
+SINKS = {
+    'csv': CsvSink,
+    'jsonl': JsonlSink,
+    'json': JsonlSink,
+    'parquet': ParquetSink,
+    'xlsx': XlsxSink,
+    'excel': ExcelSink,
+}
+
+
+# Function to open the sink for an output file; the format defaults to the file extension
+def open_sink(path, fieldnames=None, format=None, **kwargs):
+    format = format or os.path.splitext(path)[1].lstrip('.').lower()
+    if format not in SINKS:
+        raise ValueError(f"Unknown output format '{format}' for {path}")
+    return SINKS[format](path, fieldnames, **kwargs)
+
+
+# Function to copy a finished CSV stream into another output file (xlsx, parquet, ...)
+# batch by batch, without loading the whole CSV into memory
+def export_csv(csv_path, output_path, fieldnames, format=None):
+    with open(csv_path, newline='', encoding='utf-8') as f, open_sink(output_path, fieldnames, format) as sink:
+        sink.write_rows(csv.DictReader(f))
@@ -0,0 +1,58 @@
+import threading
+
+from bs4 import BeautifulSoup
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from common.browser import get_browser
+from common.metrics import metrics
+from common.retry import fetch_with_retry
+from common.scheduler import allowed_by_robots
+
+# The shared browser can only render one page at a time
+_browser_lock = threading.Lock()
+
+
+# Function to GET a page over plain HTTP; returns its body or None
+def fetch_static(url):
+    response = fetch_with_retry(url)
+    return response.content if response is not None else None
+
+
+# Function to get the parsed page for url, trying a plain HTTP GET first (or the static
+# content passed in, when the caller already fetched it; with try_static=False a missing
+# content means the caller's GET already failed and the page goes straight to the browser).
+# The static HTML is used when it contains the CSS selector; otherwise the page is
+# rendered in the shared browser and we wait up to wait_seconds for the selector.
+# Returns a BeautifulSoup document, or None when the selector never showed up (or robots.txt
+# disallows the page).
+def fetch_soup(url, selector, headless=True, wait_seconds=10, content=None, try_static=True):
+    if not allowed_by_robots(url):
+        print(f"Skipping {url}, disallowed by robots.txt")
+        return None
+    if content is None and try_static:
+        content = fetch_static(url)
+    if content is not None:
+        soup = BeautifulSoup(content, 'html.parser')
+        if soup.select_one(selector) is not None:
+            metrics.inc('render_avoided_total')
+            print(f"Found '{selector}' in the static page of {url}")
+            return soup
+        print(f"'{selector}' is missing from the static page of {url}, rendering it in the browser...")
+
+    with _browser_lock, metrics.stage('render'):
+        driver = get_browser(headless=headless)
+        driver.get(url)
+        try:
+            WebDriverWait(driver, wait_seconds).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+            )
+        except TimeoutException as e:
+            metrics.inc('render_timeouts_total')
+            print(f"'{selector}' not found or took too long to load on {url}. Error:", str(e))
+            return None
+        html = driver.page_source
+
+    return BeautifulSoup(html, 'html.parser')
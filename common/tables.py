@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from common.sinks import open_sink
+from common.static_first import fetch_soup, fetch_static
+
+# A table spec is a plain dict:
+#   name:      label used in log messages
+#   url:       page holding the table
+#   selector:  CSS selector of the table (default 'table', the first table on the page)
+#   skip_rows: number of header rows to skip (default 1)
+#   columns:   {column index: output field}, rows with fewer cells are skipped
+#   output:    file the records are written to, the format follows the extension (see common/sinks.py)
+#   headless:  run the fallback browser headless (default True)
+
+
+# Function to turn the rows of the spec's table into records
+def extract_records(soup, spec):
+    table = soup.select_one(spec.get('selector', 'table'))
+    if table is None:
+        return []
+
+    columns = spec['columns']
+    needed = max(columns) + 1
+    records = []
+    for row in table.find_all('tr')[spec.get('skip_rows', 1):]:
+        cells = row.find_all('td')
+        if len(cells) >= needed:  # Ensure every mapped column exists
+            records.append({field: cells[index].get_text(strip=True) for index, field in columns.items()})
+    return records
+
+
+# Function to scrape the table described by a spec and save it; returns the records.
+# With a tracker (common/fingerprints.py) an unchanged page is not parsed again and
+# a changed table is written to the tracker's delta output.
+def run_spec(spec, tracker=None):
+    name = spec.get('name', spec['url'])
+    content = fetch_static(spec['url'])
+
+    records = None
+    if tracker is not None:
+        tracker.mark_seen(spec['url'])
+        if content is not None:
+            records = tracker.lookup(spec['url'], content)
+            if records is not None:
+                print(f"{name}: page unchanged since the last run")
+
+    if records is None:
+        # The static GET was made above, a failed one is not repeated before the browser fallback
+        soup = fetch_soup(spec['url'], spec.get('selector', 'table'), headless=spec.get('headless', True),
+                          content=content, try_static=False)
+        if soup is None:
+            print(f"{name}: table not found, nothing to scrape.")
+            return []
+        records = extract_records(soup, spec)
+        if tracker is not None:
+            # Without a static page lookup never saw the content, so the rendered page is fingerprinted
+            tracker.update(spec['url'], records, content=str(soup) if content is None else None)
+
+    with open_sink(spec['output'], list(spec['columns'].values())) as sink:
+        sink.write_rows(records)
+
+    print(f"{name}: {len(records)} rows saved to {spec['output']}")
+    return records
+
+
+# Function to run many specs concurrently in this process (they share the pooled HTTP
+# session and, when needed, the warm browser); returns {name: records}
+def run_specs(specs, max_workers=8, tracker=None):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda spec: run_spec(spec, tracker), specs))
+    return {spec.get('name', spec['url']): records for spec, records in zip(specs, results)}
@@ -0,0 +1,69 @@
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# BBB profile slugs end with the business id, e.g. ...-orthodontics-sc-0694-44108420
+BBB_ID_PATTERN = re.compile(r'-(\d{4}-\d+)$')
+
+
+# Function to normalize a url so that equivalent spellings map to the same key:
+# https scheme, lowercase host without "www.", no default port, no trailing slash,
+# sorted query parameters and no fragment
+def canonicalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme == 'http':
+        scheme = 'https'
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r'/{2,}', '/', parts.path).rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+# Function to get the BBB business id (e.g. '0694-44108420') from a profile url, or None
+def bbb_business_id(url):
+    parts = urlsplit(url.strip())
+    if not (parts.hostname or '').lower().endswith('bbb.org'):
+        return None
+    segments = [segment for segment in parts.path.split('/') if segment]
+    if 'profile' not in segments:
+        return None
+    # /us/<state>/<city>/profile/<category>/<slug-with-id>[/...]
+    slug_index = segments.index('profile') + 2
+    if slug_index >= len(segments):
+        return None
+    match = BBB_ID_PATTERN.search(segments[slug_index])
+    return match.group(1) if match else None
+
+
+# Function to get the de-duplication key of a url (the BBB id for profiles, else the canonical url)
+def url_key(url):
+    business_id = bbb_business_id(url)
+    if business_id:
+        return f"bbb:{business_id}"
+    return canonicalize_url(url)
+
+
+# Function to drop duplicate urls, keeping the first spelling of each one in input order
+def dedupe_urls(urls):
+    seen = set()
+    unique = []
+    for url in urls:
+        key = url_key(url)
+        if key not in seen:
+            seen.add(key)
+            unique.append(url)
+    return unique
+
+
+# Function to return the url with one query parameter set (replacing any existing value)
+def set_query_param(url, name, value):
+    parts = urlsplit(url)
+    query = [(key, item) for key, item in parse_qsl(parts.query, keep_blank_values=True) if key != name]
+    query.append((name, str(value)))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
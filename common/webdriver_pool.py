@@ -0,0 +1,102 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from common.metrics import metrics
+
+# Pages a driver may load before it is replaced (keeps leaked tabs/memory in check)
+MAX_USES = 50
+
+
+# A pool of reusable browser workers. Each task gets a driver of its own; drivers that
+# crash are quit and replaced with fresh ones, and drivers are recycled after max_uses tasks.
+class DriverPool:
+    def __init__(self, create_driver, size=4, max_uses=MAX_USES, retries=1):
+        self.create_driver = create_driver
+        self.size = size
+        self.max_uses = max_uses
+        self.retries = retries
+        self._idle = queue.Queue()
+        self._uses = {}
+        self._checked_out = {}  # id -> driver handed to a task and not released yet
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            driver = self._idle.get_nowait()
+        except queue.Empty:
+            driver = self.create_driver()
+            with self._lock:
+                self._uses[id(driver)] = 0
+        with self._lock:
+            self._checked_out[id(driver)] = driver
+        return driver
+
+    # Put a driver back into the pool, or quit it when it is broken or worn out
+    def release(self, driver, broken=False):
+        with self._lock:
+            self._checked_out.pop(id(driver), None)
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+            worn_out = self._uses[id(driver)] >= self.max_uses
+        if broken or worn_out:
+            self.discard(driver)
+        else:
+            self._idle.put(driver)
+
+    def discard(self, driver):
+        with self._lock:
+            self._checked_out.pop(id(driver), None)
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    # Run func(driver, item) once per item; a task whose driver crashes is retried on a
+    # fresh driver. Results come back in the same order as the items.
+    def run(self, func, item):
+        for attempt in range(self.retries + 1):
+            driver = self.acquire()
+            try:
+                with metrics.stage('render'):
+                    result = func(driver, item)
+            except TimeoutException:
+                self.release(driver)
+                raise
+            except WebDriverException as e:
+                metrics.inc('browser_crashes_total')
+                self.release(driver, broken=True)
+                if attempt == self.retries:
+                    raise
+                print(f"Browser worker failed ({e.__class__.__name__}), retrying with a new browser...")
+                continue
+            except Exception:
+                # The task failed, not the browser, but its state is unknown: never reuse it
+                self.release(driver, broken=True)
+                raise
+            self.release(driver)
+            return result
+
+    def map(self, func, items):
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(lambda item: self.run(func, item), items))
+
+    # Quit every driver, including the ones tasks still hold
+    def close(self):
+        while True:
+            try:
+                self.discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        with self._lock:
+            checked_out = list(self._checked_out.values())
+        for driver in checked_out:
+            self.discard(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
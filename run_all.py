@@ -0,0 +1,51 @@
+import os
+import runpy
+import sys
+import traceback
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Scripts of the scheduled run. They are executed one after another in this process so
+# they share the warm browser (common/browser.py) and the pooled HTTP session.
+# BBB/crawl.py is not part of it: the all-category crawl is a long resumable job with its
+# own command line options and is started on its own.
+SCRIPTS = [
+    'BBB/category.py',
+    'BBB/test.py',
+    'BBB/scraper.py',
+    'sec.gov/run_tables.py',
+    'trademark/trademark.py',
+]
+
+# Function to run one script as if it was started from its own directory
+def run_script(script):
+    path = os.path.join(ROOT, script)
+    script_dir = os.path.dirname(path)
+    previous_dir = os.getcwd()
+    os.chdir(script_dir)
+    sys.path.insert(0, script_dir)
+    try:
+        runpy.run_path(path, run_name='__main__')
+    finally:
+        sys.path.remove(script_dir)
+        os.chdir(previous_dir)
+
+# Main function: run every script (or the ones given on the command line), a failing
+# script is reported and the run continues with the next one
+def main(scripts):
+    failed = []
+    for script in scripts:
+        print(f"Running {script}")
+        try:
+            run_script(script)
+        except Exception:
+            traceback.print_exc()
+            failed.append(script)
+
+    if failed:
+        print(f"Failed scripts: {', '.join(failed)}")
+        sys.exit(1)
+
+# Execute the main function
+if __name__ == "__main__":
+    main(sys.argv[1:] or SCRIPTS)
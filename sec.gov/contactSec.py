@@ -1,72 +1,17 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
 import os
-import pandas as pd  # Import pandas for Excel handling
+import sys
 
-# Set up Selenium with ChromeDriver
-options = webdriver.ChromeOptions()
-# Uncomment if you want to run in headless mode
-# options.add_argument('--headless')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.tables import run_spec
+from table_specs import CONTACT_SEC
 
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+# Set to True to run the browser in headless mode (only used when the static page lacks the table)
+HEADLESS = False
 
-# Load the SEC contact page
-url = "https://www.sec.gov/about/contact-sec"
-driver.get(url)
+# Main function to scrape the table and save it (url, columns and output file are in table_specs.py)
+def main():
+    run_spec(dict(CONTACT_SEC, headless=HEADLESS))
 
-# Wait for the relevant table element to load
-try:
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.TAG_NAME, 'table'))
-    )
-    print("Table found, proceeding with scraping...")
-except Exception as e:
-    print("Table not found or took too long to load. Error:", str(e))
-    driver.quit()
-    exit()
-
-# Get the page source
-html = driver.page_source
-
-# Parse the page source with BeautifulSoup
-soup = BeautifulSoup(html, 'html.parser')
-
-# Find the specific table (you may need to adjust the selector if there are multiple tables)
-table = soup.find('table')
-
-# Create a list to hold the scraped data
-data = []
-
-# Loop through the rows of the table
-rows = table.find_all('tr')[1:]  # Skip the header row
-for row in rows:
-    columns = row.find_all('td')  # Get all the columns in the row
-    if len(columns) >= 3:  # Ensure there are enough columns (Name, Phone, Email)
-        name = columns[0].get_text(strip=True)
-        phone = columns[1].get_text(strip=True)
-        email = columns[2].get_text(strip=True)
-        # Append the data to the list
-        data.append({"Name": name, "Phone": phone, "Email": email})
-
-# Convert the list of dictionaries to a DataFrame
-df = pd.DataFrame(data)
-
-# Specify the directory and file name for the Excel file
-data_dir = 'data'
-file_path = os.path.join(data_dir, 'contact.xlsx')  # Save as .xlsx
-
-# Create the data directory if it doesn't exist
-os.makedirs(data_dir, exist_ok=True)
-
-# Save the DataFrame to an Excel file
-df.to_excel(file_path, index=False)
-
-print(f"Data saved to {file_path}")
-
-# Close the browser
-driver.quit()
+# Execute the main function
+if __name__ == "__main__":
+    main()
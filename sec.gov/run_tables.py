@@ -0,0 +1,22 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.fingerprints import ChangeTracker
+from common.sinks import open_sink
+from common.tables import run_specs
+from table_specs import SPECS
+
+# Main function to scrape every sec.gov table concurrently in this process.
+# Tables whose page did not change since the last run are not parsed again, and changed
+# tables are also written to data/sec_tables.delta.jsonl
+def main():
+    with open_sink(os.path.join('data', 'sec_tables.delta.jsonl')) as delta_sink:
+        tracker = ChangeTracker(os.path.join('.cache', 'fingerprints.sqlite'), 'sec.gov', delta_sink)
+        run_specs(SPECS, tracker=tracker)
+        tracker.finish()
+        tracker.close()
+
+# Execute the main function
+if __name__ == "__main__":
+    main()
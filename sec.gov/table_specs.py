@@ -0,0 +1,28 @@
+# Tables scraped from sec.gov. Adding a new source is a new entry here (see common/tables.py
+# for the keys); run_tables.py scrapes all of them in one process.
+
+CONTACT_SEC = {
+    'name': 'contact',
+    'url': "https://www.sec.gov/about/contact-sec",
+    'selector': 'table',
+    'columns': {0: "Name", 1: "Phone", 2: "Email"},
+    'output': 'data/contact.xlsx',
+}
+
+DIVISIONS_OFFICES = {
+    'name': 'division&offices',
+    'url': "https://www.sec.gov/about/divisions-offices",
+    'selector': 'table',
+    'columns': {0: "Section Divisions", 1: "Name", 2: "Title", 3: "Phone"},
+    'output': 'data/division_sec.xlsx',
+}
+
+REGIONAL_OFFICES = {
+    'name': 'regionalOffices',
+    'url': "https://www.sec.gov/about/regional-offices",
+    'selector': 'table',
+    'columns': {0: "Section Divisions", 1: "Address", 2: "Phone"},
+    'output': 'data/regionalOffices.xlsx',
+}
+
+SPECS = [CONTACT_SEC, DIVISIONS_OFFICES, REGIONAL_OFFICES]
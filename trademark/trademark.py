@@ -1,91 +1,67 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
 import os
-import pandas as pd  # Import pandas for Excel handling
+import sys
 
-# Set up Selenium with ChromeDriver
-options = webdriver.ChromeOptions()
-# Uncomment if you want to run in headless mode
-# options.add_argument('--headless')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.html_table import read_table
+from common.sinks import open_sink
+from common.static_first import fetch_soup
 
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+# Set to True to run the browser in headless mode (only used when the static page lacks the table)
+HEADLESS = False
 
-# Load the SEC contact page
+# Page with the table
 url = "https://www.uspto.gov/patents/basics/international-protection/filing-patents-abroad"
-driver.get(url)
 
-# Wait for the relevant table element to load
-try:
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.TAG_NAME, 'table'))
-    )
+# Function to turn the rows of the table into records, one per IP office.
+# The table is walked once: headings are read from the header row up front and the
+# country <th>, which spans all rows of its country (rowspan), is repeated by the grid.
+def iter_entries(table):
+    headings, rows = read_table(table)  # Skips the header row
+    for cells in rows:
+        if len(cells) - 1 >= 9 and None not in cells[:2]:  # Country column plus the office columns
+            entry = {}
+
+            # Get Country/Region and its link
+            country_region_th = cells[0]
+            entry["Country/region"] = country_region_th.get_text(strip=True)
+            entry["Country/region URL"] = country_region_th.find('a')['href'] if country_region_th.find('a') else ''
+
+            # Get IP Office and its link
+            ip_office_td = cells[1]  # First office column (IP Office)
+            entry["IP Office"] = ip_office_td.get_text(strip=True)
+            entry["IP Office URL"] = ip_office_td.find('a')['href'] if ip_office_td.find('a') else ''
+
+            # Capture remaining headings and links
+            for position in range(2, min(len(headings), len(cells))):
+                heading = headings[position]
+                link = cells[position].find('a') if cells[position] is not None else None
+                entry[heading] = link.get_text(strip=True) if link else ''
+                entry[f"{heading} URL"] = link['href'] if link else ''
+
+            yield entry
+
+# Main function to scrape the table and save it
+def main():
+    # Fetch the page over plain HTTP, falling back to the browser if the table is missing
+    soup = fetch_soup(url, 'table', headless=HEADLESS)
+    if soup is None:
+        print("Table not found, nothing to scrape.")
+        return
     print("Table found, proceeding with scraping...")
-except Exception as e:
-    print("Table not found or took too long to load. Error:", str(e))
-    driver.quit()
-    exit()
 
-# Get the page source
-html = driver.page_source
+    # Find the specific table
+    table = soup.find('table')
 
-# Parse the page source with BeautifulSoup
-soup = BeautifulSoup(html, 'html.parser')
+    # Specify the directory and file name for the JSON file
+    data_dir = 'data'
+    json_file_path = os.path.join(data_dir, 'stakeholder_resources.json')  # Save as .json
 
-# Find the specific table
-table = soup.find('table')
+    # Stream the records to the JSON lines file as they are built (the directory is created if needed)
+    with open_sink(json_file_path, format='jsonl') as sink:
+        sink.write_rows(iter_entries(table))
 
-# Create a list to hold the scraped data
-data = []
+    print(f"Data saved to {json_file_path}")
 
-# Loop through the rows of the table
-# Loop through the rows of the table
-rows = table.find_all('tr')[1:]  # Skip the header row
-for row in rows:
-    columns = row.find_all('td')  # Get all the columns in the row
-    if len(columns) >= 9:  # Adjust as necessary for the number of columns
-        entry = {}
-
-        # Get Country/Region and its link
-        country_region_th = row.find_previous('th', string=lambda x: x is not None)
-        entry["Country/region"] = country_region_th.get_text(strip=True)
-        entry["Country/region URL"] = country_region_th.find('a')['href'] if country_region_th.find('a') else ''
-
-        # Get IP Office and its link
-        ip_office_td = columns[0]  # First column (IP Office)
-        entry["IP Office"] = ip_office_td.get_text(strip=True)
-        entry["IP Office URL"] = ip_office_td.find('a')['href'] if ip_office_td.find('a') else ''
-
-        # Capture remaining headings and links
-        headings = [header.get_text(strip=True) for header in table.find_all('th')[2:]]
-        for i in range(len(headings)):
-            if i < len(columns) - 1:  # Ensure the index is valid
-                link = columns[i + 1].find('a')  # Adjust index as needed
-                entry[headings[i]] = link.get_text(strip=True) if link else ''
-                entry[f"{headings[i]} URL"] = link['href'] if link else ''
-
-        # Append the entry to the data list
-        data.append(entry)
-
-
-# Convert the list of dictionaries to a DataFrame
-df = pd.DataFrame(data)
-
-# Specify the directory and file name for the JSON file
-data_dir = 'data'
-json_file_path = os.path.join(data_dir, 'stakeholder_resources.json')  # Save as .json
-
-# Create the data directory if it doesn't exist
-os.makedirs(data_dir, exist_ok=True)
-
-# Save the DataFrame to a JSON file
-df.to_json(json_file_path, orient='records', lines=True)
-
-print(f"Data saved to {json_file_path}")
-
-# Close the browser
-driver.quit()
+# Execute the main function
+if __name__ == "__main__":
+    main()